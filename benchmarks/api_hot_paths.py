@@ -0,0 +1,305 @@
+"""
+Load test for the API hot paths.
+
+Seeds a synthetic dataset (api/datagen.py) into --db, then runs each
+endpoint (register, login, complete_activity, mirror_today, mirror_week,
+get_all_activities, seed) with --clients concurrent clients and reports p50/p95/p99 latency,
+throughput and SQL queries per request (read from /metrics).
+
+    # in-process (Flask test client), fresh SQLite file
+    $ python benchmarks/api_hot_paths.py --users 200 --days 30
+
+    # against a running server (start it with METRICS_ENABLED=1 FLASK_DEBUG=1
+    # RATE_LIMIT_ENABLED=0),
+    # e.g. to compare WEB_WORKER_CLASS=sync and gthread on the same cores
+    $ python benchmarks/api_hot_paths.py --db $DATABASE_URL --url http://localhost:3001
+
+    # save / compare against benchmarks/baseline.json
+    $ python benchmarks/api_hot_paths.py --save-baseline
+    $ python benchmarks/api_hot_paths.py --compare
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "../src"))
+
+# The seed endpoint only exists in development
+os.environ["FLASK_DEBUG"] = "1"
+os.environ.setdefault("FLASK_APP_KEY", "benchmark-key-benchmark-key-benchmark")
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+PASSWORD = "bench-password"
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        r = client.open(path, method=method, json=json_body, headers=headers)
+        return r.status_code, r.get_data()
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self._base = base_url.rstrip("/")
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        r = session.request(method, self._base + path, json=json_body, headers=headers, timeout=60)
+        return r.status_code, r.content
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+QUERY_LINE = re.compile(
+    r'^http_request_sql_queries_(sum|count)\{endpoint="([^"]+)",method="[A-Z]+"\} ([0-9.e+-]+)$')
+
+
+def query_totals(client):
+    """{endpoint: [sum, count]} from /metrics"""
+    status, body = client.request("GET", "/metrics")
+    totals = {}
+    if status != 200:
+        return totals
+    for line in body.decode().splitlines():
+        m = QUERY_LINE.match(line)
+        if m:
+            kind, endpoint, value = m.groups()
+            totals.setdefault(endpoint, [0.0, 0.0])[0 if kind == "sum" else 1] += float(value)
+    return totals
+
+
+def run_phase(client, endpoint, make_request, clients, requests_per_client):
+    """Run `make_request(worker_id, i)` -> (method, path, body, headers) concurrently"""
+    before = query_totals(client)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        nonlocal errors
+        local_lat, local_err = [], 0
+        for i in range(requests_per_client):
+            method, path, body, headers = make_request(worker_id, i)
+            start = time.perf_counter()
+            status, _ = client.request(method, path, body, headers)
+            local_lat.append(time.perf_counter() - start)
+            if status >= 400:
+                local_err += 1
+        with lock:
+            latencies.extend(local_lat)
+            errors += local_err
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, range(clients)))
+    wall = time.perf_counter() - start
+
+    after = query_totals(client)
+    q_sum = after.get(endpoint, [0, 0])[0] - before.get(endpoint, [0, 0])[0]
+    q_count = after.get(endpoint, [0, 0])[1] - before.get(endpoint, [0, 0])[1]
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "queries_per_request": round(q_sum / q_count, 2) if q_count else None,
+    }
+
+
+def seed(db_url, users, days, fresh):
+    from app import create_app
+    from api.models import db
+    from api import datagen
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": db_url,
+        "ADMIN_ENABLED": False,
+        "METRICS_ENABLED": True,
+        # every benchmark client logs in from the same IP
+        "RATE_LIMIT_ENABLED": False,
+    })
+    with app.app_context():
+        if fresh:
+            db.drop_all()
+            db.create_all()
+            counts = datagen.generate(users, days, seed=42)
+        else:
+            counts = None
+        emails = [
+            e for (e,) in db.session.execute(db.text(
+                "SELECT email FROM users WHERE email LIKE 'bench_user%' ORDER BY id LIMIT :n"),
+                {"n": users})
+        ]
+        db.session.remove()
+    return app, emails, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API hot path benchmark")
+    parser.add_argument("--db", default="sqlite:////tmp/placebetween_bench.db")
+    parser.add_argument("--url", help="Benchmark a running server instead of in-process")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=25, help="Requests per client per endpoint")
+    parser.add_argument("--no-fresh", action="store_true", help="Reuse data already in --db")
+    parser.add_argument("--only", help="Comma separated phase names")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=25.0,
+                        help="Percent p95 increase that fails --compare")
+    parser.add_argument("--output", help="Also write the report JSON here")
+    args = parser.parse_args()
+
+    app, emails, counts = seed(args.db, args.users, args.days, not args.no_fresh)
+    if not emails:
+        sys.exit("No bench_user* users in the database; run without --no-fresh")
+
+    client = HttpClient(args.url) if args.url else InProcessClient(app)
+    rng = random.Random(7)
+
+    # Log every client in once; tokens are reused by the other phases
+    tokens = {}
+
+    def login_request(worker_id, i):
+        return "POST", "/api/login", {"email": rng.choice(emails), "password": PASSWORD}, None
+
+    run_id = int(time.time())
+
+    def register_request(worker_id, i):
+        name = f"bench_reg_{run_id}_{worker_id}_{i}"
+        body = {"email": name + "@example.com", "username": name, "password": PASSWORD}
+        return "POST", "/api/register", body, None
+
+    for worker_id in range(args.clients):
+        status, body = client.request(
+            "POST", "/api/login", {"email": emails[worker_id % len(emails)], "password": PASSWORD})
+        tokens[worker_id] = {"Authorization": "Bearer " + json.loads(body)["access_token"]}
+
+    status, body = client.request("GET", "/api/activities")
+    catalog = json.loads(body)
+    external_ids = [a["external_id"] for a in catalog]
+    seed_payload = {"activities": [
+        {"id": a["external_id"], "title": a["name"], "phase": a["activity_type"], "branch": "Regulación"}
+        for a in catalog
+    ]}
+
+    def get(path):
+        return lambda w, i: ("GET", path, None, tokens[w])
+
+    def complete_request(w, i):
+        body = {
+            "external_id": rng.choice(external_ids),
+            "session_type": rng.choice(("day", "night")),
+            "source": "catalog",
+        }
+        return "POST", "/api/activities/complete", body, tokens[w]
+
+    phases = [
+        ("register", "api.register", register_request),
+        ("login", "api.login", login_request),
+        ("complete_activity", "api.complete_activity", complete_request),
+        ("mirror_today", "api.mirror_today", get("/api/mirror/today")),
+        ("mirror_week", "api.mirror_week", get("/api/mirror/week")),
+        ("get_all_activities", "api.get_all_activities", get("/api/activities")),
+        ("seed_activities", "api.dev_seed_activities_bulk",
+         lambda w, i: ("POST", "/api/dev/seed/activities/bulk", seed_payload, None)),
+    ]
+    if args.only:
+        wanted = set(args.only.split(","))
+        phases = [p for p in phases if p[0] in wanted]
+
+    results = {}
+    for name, endpoint, make_request in phases:
+        results[name] = run_phase(client, endpoint, make_request, args.clients, args.requests)
+        print(f"{name:20s} {json.dumps(results[name])}", flush=True)
+
+    report = {
+        "meta": {
+            "db": args.db.split("://")[0],
+            "mode": "http" if args.url else "in-process",
+            "users": args.users,
+            "days": args.days,
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "rows": counts,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print("Baseline saved to", BASELINE_PATH)
+
+    if args.compare:
+        sys.exit(compare(report, args.max_regression))
+
+
+def compare(report, max_regression):
+    """Print deltas vs baseline.json; non-zero exit on a p95 or query-count regression"""
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+
+    failed = False
+    print("\nvs baseline (p95 / rps / queries per request):")
+    for name, current in report["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        p95_delta = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+        rps_delta = (current["rps"] - base["rps"]) / base["rps"] * 100 if base["rps"] else 0.0
+        # Query counts are deterministic, so any real increase is a regression
+        more_queries = (
+            base["queries_per_request"] is not None
+            and current["queries_per_request"] is not None
+            and current["queries_per_request"] > base["queries_per_request"] + 0.5
+        )
+        flag = ""
+        if p95_delta > max_regression or more_queries:
+            flag = "  REGRESSION"
+            failed = True
+        print(f"  {name:20s} p95 {p95_delta:+6.1f}%  rps {rps_delta:+6.1f}%  "
+              f"queries {base['queries_per_request']} -> {current['queries_per_request']}{flag}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    main()
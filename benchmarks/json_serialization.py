@@ -0,0 +1,74 @@
+"""
+Serialization benchmark: ORM objects + serialize() + stdlib json (the old
+path) against column rows + FastJSONProvider (orjson when installed).
+
+    $ python benchmarks/json_serialization.py --users 300 --days 30
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "../src"))
+os.environ.setdefault("FLASK_APP_KEY", "benchmark-key-benchmark-key-benchmark")
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = len(fn())
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from api.models import db, ActivityCompletion
+    from api.serializers import column_rows
+    from api import datagen, json_provider
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ADMIN_ENABLED": False})
+    stdlib = DefaultJSONProvider(app)
+    fast = app.json
+
+    with app.app_context():
+        db.create_all()
+        datagen.generate(args.users, args.days)
+
+        columns = (
+            ActivityCompletion.id,
+            ActivityCompletion.daily_session_id,
+            ActivityCompletion.activity_id,
+            ActivityCompletion.points_awarded,
+            ActivityCompletion.completed_at,
+        )
+
+        def old_path():
+            rows = [c.serialize() for c in ActivityCompletion.query.all()]
+            db.session.expunge_all()
+            return stdlib.dumps(rows)
+
+        def new_path():
+            return fast.dumps(column_rows(columns, order_by=ActivityCompletion.id))
+
+        old_ms, old_size = timed(old_path, args.runs)
+        new_ms, new_size = timed(new_path, args.runs)
+
+    backend = "orjson" if json_provider.orjson is not None else "stdlib"
+    print(f"completions payload: {old_size} vs {new_size} bytes")
+    print(f"ORM + serialize() + json : {old_ms} ms")
+    print(f"columns + {backend:6s}         : {new_ms} ms ({old_ms / new_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Cold-start benchmark: how long a fresh worker takes to import app.py and run
+create_app(). Every sample is a new interpreter, like a new gunicorn worker.
+
+    $ python benchmarks/startup.py --runs 10
+    $ ADMIN_ENABLED=0 python benchmarks/startup.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../src")
+
+# Runs inside the child interpreter, prints {"import": s, "boot": s}
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "boot": t2 - t1}))
+"""
+
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault("FLASK_APP_KEY", "bench")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    report = {}
+    for key in ("import", "boot"):
+        values = [s[key] * 1000 for s in samples]
+        report[key] = {
+            "median_ms": round(statistics.median(values), 1),
+            "min_ms": round(min(values), 1),
+            "max_ms": round(max(values), 1),
+        }
+    report["total_median_ms"] = round(
+        report["import"]["median_ms"] + report["boot"]["median_ms"], 1)
+    report["runs"] = args.runs
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Gunicorn settings (Procfile / render.yaml: gunicorn -c gunicorn.conf.py wsgi --chdir ./src/)
+
+Most request time is spent waiting on PostgreSQL or the Loops API, so the
+default is the threaded worker: a blocked request holds a thread, not a
+whole process.
+
+    WEB_WORKER_CLASS=gthread   gthread (default) | sync | gevent
+    WEB_CONCURRENCY=2          worker processes; ~1-2 per CPU core, fewer on 512 MB plans
+    WEB_THREADS=4              threads per gthread worker; 4-8 for I/O-bound traffic
+    WEB_TIMEOUT=30
+
+Each thread needs its own database connection, so DB_POOL_SIZE defaults to
+WEB_THREADS here. Keep WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+below the database's max_connections (Render's free Postgres allows ~97).
+
+gevent (pip install gevent psycogreen) serves many more concurrent requests
+per worker; psycopg2 is made cooperative in post_fork below. With gevent,
+WEB_THREADS is ignored and DB_POOL_SIZE should be set explicitly (10-20).
+"""
+import os
+
+bind = "0.0.0.0:" + os.getenv("PORT", "8000")
+
+worker_class = os.getenv("WEB_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("WEB_THREADS", 4)) if worker_class == "gthread" else 1
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+keepalive = 5
+
+if worker_class == "gevent":
+    worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", 200))
+
+# Read by api/db_pool.py when the workers build the app
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,105 @@
+"""user_id and session_date on completions and check-ins
+
+Revision ID: 4d8e0f3a6b21
+Revises: 9c4b2e71d0a8
+Create Date: 2026-10-19 14:05:33.170482
+
+Copies daily_sessions.user_id/session_date onto activity_completions and
+emotion_checkins so per-user history reads one table. The backfill runs in
+id ranges of BACKFILL_BATCH rows, each committed on its own, so a large
+table isn't rewritten in one long transaction; rerunning it only touches
+rows still missing the values.
+
+The backfill's autocommit block also commits the new columns, so if a
+later step fails they stay. Every step checks what is already there, so
+`flask db upgrade` can simply be run again.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8e0f3a6b21'
+down_revision = '9c4b2e71d0a8'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 10000
+TABLES = ('activity_completions', 'emotion_checkins')
+INDEXES = {
+    'activity_completions': ('ix_activity_completions_user_date', ['user_id', 'session_date']),
+    'emotion_checkins': ('ix_emotion_checkins_user_date_created', ['user_id', 'session_date', 'created_at']),
+}
+FOREIGN_KEYS = {
+    'activity_completions': 'fk_activity_completions_user_id',
+    'emotion_checkins': 'fk_emotion_checkins_user_id',
+}
+
+
+def _inspect():
+    # A fresh inspector each time: the schema changes between the steps
+    return sa.inspect(op.get_bind())
+
+
+def _backfill(table):
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        update = sa.text(
+            f"UPDATE {table} AS t SET user_id = s.user_id, session_date = s.session_date "
+            f"FROM daily_sessions AS s "
+            f"WHERE s.id = t.daily_session_id AND t.user_id IS NULL "
+            f"AND t.id >= :lo AND t.id < :hi"
+        )
+    else:
+        update = sa.text(
+            f"UPDATE {table} SET "
+            f"user_id = (SELECT s.user_id FROM daily_sessions s WHERE s.id = {table}.daily_session_id), "
+            f"session_date = (SELECT s.session_date FROM daily_sessions s WHERE s.id = {table}.daily_session_id) "
+            f"WHERE user_id IS NULL AND id >= :lo AND id < :hi"
+        )
+    lo, hi = conn.execute(sa.text(f"SELECT MIN(id), MAX(id) FROM {table}")).one()
+    if lo is None:
+        return
+    for start in range(lo, hi + 1, BACKFILL_BATCH):
+        conn.execute(update, {'lo': start, 'hi': start + BACKFILL_BATCH})
+
+
+def upgrade():
+    for table in TABLES:
+        existing = {c['name'] for c in _inspect().get_columns(table)}
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if 'user_id' not in existing:
+                batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+            if 'session_date' not in existing:
+                batch_op.add_column(sa.Column('session_date', sa.Date(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _backfill(table)
+
+    for table in TABLES:
+        inspector = _inspect()
+        foreign_keys = {fk['name'] for fk in inspector.get_foreign_keys(table)}
+        indexes = {ix['name'] for ix in inspector.get_indexes(table)}
+        index_name, index_columns = INDEXES[table]
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column('session_date', existing_type=sa.Date(), nullable=False)
+            if FOREIGN_KEYS[table] not in foreign_keys:
+                batch_op.create_foreign_key(FOREIGN_KEYS[table], 'users', ['user_id'], ['id'], ondelete='CASCADE')
+            if index_name not in indexes:
+                batch_op.create_index(index_name, index_columns, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('emotion_checkins', schema=None) as batch_op:
+        batch_op.drop_index('ix_emotion_checkins_user_date_created')
+        batch_op.drop_constraint('fk_emotion_checkins_user_id', type_='foreignkey')
+        batch_op.drop_column('session_date')
+        batch_op.drop_column('user_id')
+
+    with op.batch_alter_table('activity_completions', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_completions_user_date')
+        batch_op.drop_constraint('fk_activity_completions_user_id', type_='foreignkey')
+        batch_op.drop_column('session_date')
+        batch_op.drop_column('user_id')
@@ -0,0 +1,54 @@
+"""indexes for the hot queries
+
+Revision ID: 9c4b2e71d0a8
+Revises: 11f3712746bd
+Create Date: 2026-10-19 12:40:51.902113
+
+Replaces two single-purpose indexes with ones matched to the queries that
+use them (checked by `flask explain-hot-queries`):
+
+- daily_sessions (user_id, session_date) INCLUDE (session_type, points_earned):
+  mirror_week becomes an index-only scan on PostgreSQL.
+- emotion_checkins (daily_session_id, created_at): the latest check-in of
+  today is read in index order instead of sorting the day's rows.
+- activity_completions (daily_session_id) is dropped; uq_session_activity
+  starts with the same column and serves those lookups.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4b2e71d0a8'
+down_revision = '11f3712746bd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('daily_sessions', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_daily_sessions_user_date_points', ['user_id', 'session_date'], unique=False,
+            postgresql_include=['session_type', 'points_earned'],
+        )
+        batch_op.drop_index('ix_daily_sessions_user_date')
+
+    with op.batch_alter_table('emotion_checkins', schema=None) as batch_op:
+        batch_op.create_index('ix_emotion_checkins_session_created', ['daily_session_id', 'created_at'], unique=False)
+        batch_op.drop_index('ix_emotion_checkins_session')
+
+    with op.batch_alter_table('activity_completions', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_completions_session')
+
+
+def downgrade():
+    with op.batch_alter_table('activity_completions', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_completions_session', ['daily_session_id'], unique=False)
+
+    with op.batch_alter_table('emotion_checkins', schema=None) as batch_op:
+        batch_op.create_index('ix_emotion_checkins_session', ['daily_session_id'], unique=False)
+        batch_op.drop_index('ix_emotion_checkins_session_created')
+
+    with op.batch_alter_table('daily_sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_sessions_user_date', ['user_id', 'session_date'], unique=False)
+        batch_op.drop_index('ix_daily_sessions_user_date_points')
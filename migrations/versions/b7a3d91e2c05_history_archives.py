@@ -0,0 +1,43 @@
+"""history archives
+
+Revision ID: b7a3d91e2c05
+Revises: 4d8e0f3a6b21
+Create Date: 2026-10-19 17:48:26.031957
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7a3d91e2c05'
+down_revision = '4d8e0f3a6b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('history_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('period_end', sa.Date(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('completions', sa.Integer(), nullable=False),
+    sa.Column('checkins', sa.Integer(), nullable=False),
+    sa.Column('points', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('history_archives', schema=None) as batch_op:
+        batch_op.create_index('ix_history_archives_user_period', ['user_id', 'period_start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('history_archives', schema=None) as batch_op:
+        batch_op.drop_index('ix_history_archives_user_period')
+
+    op.drop_table('history_archives')
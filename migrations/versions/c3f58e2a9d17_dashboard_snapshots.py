@@ -0,0 +1,30 @@
+"""dashboard snapshots
+
+Revision ID: c3f58e2a9d17
+Revises: b7a3d91e2c05
+Create Date: 2026-10-19 18:34:52.417806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f58e2a9d17'
+down_revision = 'b7a3d91e2c05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dashboard_snapshots',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('duration_ms', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_snapshots')
@@ -0,0 +1,30 @@
+"""token version on users for access token revocation
+
+Revision ID: d81b6f0c4e73
+Revises: c3f58e2a9d17
+Create Date: 2026-10-19 19:12:40.583119
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81b6f0c4e73'
+down_revision = 'c3f58e2a9d17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('tokens_revoked_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_users_tokens_revoked_at'), ['tokens_revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_tokens_revoked_at'))
+        batch_op.drop_column('tokens_revoked_at')
+        batch_op.drop_column('token_version')
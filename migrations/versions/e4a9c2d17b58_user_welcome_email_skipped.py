@@ -0,0 +1,26 @@
+"""welcome_email_skipped on users for imported and generated accounts
+
+Revision ID: e4a9c2d17b58
+Revises: d81b6f0c4e73
+Create Date: 2026-10-19 21:03:17.402615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9c2d17b58'
+down_revision = 'd81b6f0c4e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('welcome_email_skipped', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('welcome_email_skipped')
@@ -12,3 +12,6 @@ pip install pipenv
 pipenv install
 
 pipenv run upgrade
+
+# Pre-built .gz/.br copies of dist/ for the static layer
+pipenv run precompress
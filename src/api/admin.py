@@ -5,14 +5,19 @@ from . import models
 from .models import db
 from flask_admin.contrib.sqla import ModelView
 from flask_admin.theme import Bootstrap4Theme
+from .admin_views import ADMIN_VIEWS, DashboardView
 
 
 def setup_admin(app):
-    app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
+    # Keep the key from create_app's config if there is one
+    app.secret_key = app.secret_key or os.environ.get('FLASK_APP_KEY', 'sample key')
     admin = Admin(app, name='4Geeks Admin', theme=Bootstrap4Theme(swatch='cerulean'))
+    admin.add_view(DashboardView(name='Dashboard', endpoint='dashboard'))
 
     # Dynamically add all models to the admin interface
     for name, obj in inspect.getmembers(models):
         # Verify that the object is a SQLAlchemy model before adding it to the admin. 
         if inspect.isclass(obj) and issubclass(obj, db.Model):
-            admin.add_view(ModelView(obj, db.session))
\ No newline at end of file
+            # High-volume tables get views that don't scan them (admin_views.py)
+            view = ADMIN_VIEWS.get(obj, ModelView)
+            admin.add_view(view(obj, db.session))
\ No newline at end of file
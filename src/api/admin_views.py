@@ -0,0 +1,143 @@
+"""
+Admin list views for the tables that grow with usage.
+
+The generic ModelView counts every row of the table on each page load,
+sorts/filters on any column and searches with LIKE '%term%'. On the history
+tables those are full scans. HistoryModelView instead:
+
+- counts at most COUNT_CAP matching rows, which also caps how deep the
+  pager (OFFSET) can go;
+- sorts by id and filters only on indexed columns;
+- searches by exact user id or email, both indexed;
+- eager-loads the relations shown in the list (column_auto_select_related)
+  instead of one lazy load per row.
+
+DashboardView shows the snapshots `flask refresh-dashboard` stores
+(api/dashboard.py); it never aggregates on page load.
+"""
+from datetime import datetime
+import sqlalchemy as sa
+from flask import current_app
+from flask_admin import BaseView, expose
+from flask_admin.contrib.sqla import ModelView
+from sqlalchemy.orm import defer
+from api.dashboard import JOBS, snapshot_cache
+from api.models import (
+    User,
+    DailySession,
+    ActivityCompletion,
+    EmotionCheckin,
+    HistoryArchive,
+)
+
+COUNT_CAP = 10000
+
+
+def user_id_for(term):
+    """Exact user id or email -> user id (None if there is no such user)"""
+    term = term.strip()
+    if term.isdigit():
+        return int(term)
+    if "@" in term:
+        return sa.select(User.id).where(User.email == term.lower()).scalar_subquery()
+    return None
+
+
+class HistoryModelView(ModelView):
+    page_size = 50
+    can_set_page_size = False
+    # get_list() computes its own (capped) count
+    simple_list_pager = True
+    column_display_pk = True
+    column_default_sort = ("id", True)
+    column_sortable_list = ("id",)
+    column_searchable_list = ("user_id",)
+    # Loader options for the list query, e.g. defer() of large columns
+    list_query_options = ()
+
+    def search_placeholder(self):
+        return "User id or exact email"
+
+    def get_query(self):
+        return super().get_query().options(*self.list_query_options)
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        user_id = user_id_for(search)
+        condition = self.model.user_id == user_id if user_id is not None else sa.false()
+        query = query.filter(condition)
+        if count_query is not None:
+            count_query = count_query.filter(condition)
+        return query, count_query, joins, count_joins
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        page_size = page_size or self.page_size
+        last_page = max(0, -(-COUNT_CAP // page_size) - 1)
+        if page and page > last_page:
+            page = last_page
+
+        _, query = super().get_list(page, sort_column, sort_desc, search, filters,
+                                    execute=False, page_size=page_size)
+        matching = (
+            query.enable_eagerloads(False)
+            .with_entities(self.model.id)
+            .limit(None)
+            .offset(None)
+            .order_by(None)
+            .limit(COUNT_CAP)
+            .subquery()
+        )
+        count = self.session.query(sa.func.count()).select_from(matching).scalar()
+        return count, query.all() if execute else query
+
+
+class DailySessionView(HistoryModelView):
+    column_list = ("id", "user_id", "session_date", "session_type", "points_earned",
+                   "is_active", "created_at")
+    # uq_session_user_date_type starts with user_id
+    column_filters = ("user_id",)
+
+
+class ActivityCompletionView(HistoryModelView):
+    column_list = ("id", "user_id", "session_date", "activity", "points_awarded",
+                   "completed_at")
+    column_filters = ("user_id", "daily_session_id", "activity_id")
+
+
+class EmotionCheckinView(HistoryModelView):
+    column_list = ("id", "user_id", "session_date", "emotion", "intensity", "created_at")
+    column_filters = ("user_id", "daily_session_id", "emotion_id")
+
+
+class HistoryArchiveView(HistoryModelView):
+    can_create = False
+    can_edit = False
+    column_list = ("id", "user_id", "period_start", "period_end", "sessions",
+                   "completions", "checkins", "points", "created_at")
+    column_details_exclude_list = ("payload",)
+    column_filters = ("user_id",)
+    list_query_options = (defer(HistoryArchive.payload),)
+
+
+class DashboardView(BaseView):
+    @expose("/")
+    def index(self):
+        snapshots = snapshot_cache().get()
+        now = datetime.utcnow()
+        stale_after = current_app.config["DASHBOARD_STALE_SECONDS"]
+        ages = {name: (now - s["computed_at"]).total_seconds() for name, s in snapshots.items()}
+        return self.render(
+            "admin/dashboard.html",
+            snapshots=snapshots,
+            ages=ages,
+            stale={name: age > stale_after for name, age in ages.items()},
+            missing=[name for name in JOBS if name not in snapshots],
+        )
+
+
+ADMIN_VIEWS = {
+    DailySession: DailySessionView,
+    ActivityCompletion: ActivityCompletionView,
+    EmotionCheckin: EmotionCheckinView,
+    HistoryArchive: HistoryArchiveView,
+}
@@ -0,0 +1,207 @@
+"""
+Archive tier for cold history (`flask archive-history`).
+
+Sessions of inactive users older than the horizon, with their completions,
+check-ins and session goals, are moved out of the hot tables into one
+HistoryArchive row per user and run: a zlib-compressed JSON document plus
+the range's totals, so totals never need the blob.
+
+    ARCHIVE_HORIZON_DAYS=365    history older than this is archived
+    ARCHIVE_INACTIVE_DAYS=180   only for users not seen (activity/login) since
+
+Each user is archived in its own transaction (insert the archive row, delete
+what it holds), so the command can be stopped and rerun at any point. The
+horizon can't be shorter than the Mirror views' window, so they never read
+archived days. export_history() returns archived and live history in one
+format.
+"""
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from api.models import (
+    db,
+    User,
+    DailySession,
+    ActivityCompletion,
+    EmotionCheckin,
+    DailySessionGoal,
+    GoalProgress,
+    HistoryArchive,
+)
+
+PAYLOAD_VERSION = 1
+# mirror_week reads the last 7 days
+MIN_HORIZON_DAYS = 8
+
+
+def _session_documents(sessions, completions, checkins, goals):
+    """Sessions as serialize() dicts with their children nested"""
+    children = {s.id: {"activities": [], "checkins": [], "goals": []} for s in sessions}
+    for key, rows in (("activities", completions), ("checkins", checkins), ("goals", goals)):
+        for row in rows:
+            children[row.daily_session_id][key].append(row.serialize())
+    return [dict(s.serialize(), **children[s.id]) for s in sessions]
+
+
+def _load(user_id, before=None):
+    """Sessions (with children) of a user, optionally only those before a date"""
+    session_filter = [DailySession.user_id == user_id]
+    completion_filter = [ActivityCompletion.user_id == user_id]
+    checkin_filter = [EmotionCheckin.user_id == user_id]
+    if before is not None:
+        session_filter.append(DailySession.session_date < before)
+        completion_filter.append(ActivityCompletion.session_date < before)
+        checkin_filter.append(EmotionCheckin.session_date < before)
+
+    sessions = (
+        DailySession.query.filter(*session_filter)
+        .order_by(DailySession.session_date, DailySession.id).all()
+    )
+    completions = (
+        ActivityCompletion.query.filter(*completion_filter)
+        .order_by(ActivityCompletion.completed_at).all()
+    )
+    checkins = (
+        EmotionCheckin.query.filter(*checkin_filter)
+        .order_by(EmotionCheckin.created_at).all()
+    )
+    session_ids = db.select(DailySession.id).where(*session_filter)
+    goals = DailySessionGoal.query.filter(DailySessionGoal.daily_session_id.in_(session_ids)).all()
+    return sessions, completions, checkins, goals
+
+
+def archive_user(user_id, before):
+    """Archive a user's sessions before `before`; returns the HistoryArchive or None"""
+    sessions, completions, checkins, goals = _load(user_id, before)
+    if not sessions:
+        return None
+
+    document = {
+        "version": PAYLOAD_VERSION,
+        "sessions": _session_documents(sessions, completions, checkins, goals),
+    }
+    archive = HistoryArchive(
+        user_id=user_id,
+        period_start=sessions[0].session_date,
+        period_end=sessions[-1].session_date,
+        sessions=len(sessions),
+        completions=len(completions),
+        checkins=len(checkins),
+        points=sum(s.points_earned or 0 for s in sessions),
+        version=PAYLOAD_VERSION,
+        payload=zlib.compress(json.dumps(document, separators=(",", ":")).encode(), 9),
+    )
+    db.session.add(archive)
+
+    # Set-based deletes, children first (SQLite doesn't enforce ON DELETE)
+    session_ids = db.select(DailySession.id).where(
+        DailySession.user_id == user_id, DailySession.session_date < before)
+    db.session.execute(db.delete(EmotionCheckin).where(
+        EmotionCheckin.user_id == user_id, EmotionCheckin.session_date < before))
+    db.session.execute(db.delete(ActivityCompletion).where(
+        ActivityCompletion.user_id == user_id, ActivityCompletion.session_date < before))
+    db.session.execute(db.delete(DailySessionGoal).where(
+        DailySessionGoal.daily_session_id.in_(session_ids)))
+    db.session.execute(db.update(GoalProgress).where(
+        GoalProgress.daily_session_id.in_(session_ids)).values(daily_session_id=None))
+    db.session.execute(db.delete(DailySession).where(
+        DailySession.user_id == user_id, DailySession.session_date < before))
+    db.session.commit()
+    return archive
+
+
+def candidates(before, inactive_since, after_id=0, limit=100):
+    """Ids of inactive users with sessions before `before`, in id order after `after_id`"""
+    last_seen = db.func.coalesce(User.last_activity_at, User.last_login_at, User.created_at)
+    has_old_sessions = db.select(DailySession.id).where(
+        DailySession.user_id == User.id, DailySession.session_date < before
+    ).exists()
+    return db.session.execute(
+        db.select(User.id)
+        .where(User.id > after_id, last_seen < inactive_since, has_old_sessions)
+        .order_by(User.id)
+        .limit(limit)
+    ).scalars().all()
+
+
+def run_archiver(horizon_days, inactive_days, batch_users=100, max_users=None,
+                 dry_run=False, progress=None):
+    """Archive every candidate user; returns totals of what was moved"""
+    if horizon_days < MIN_HORIZON_DAYS:
+        raise ValueError(f"horizon_days must be at least {MIN_HORIZON_DAYS}")
+    before = date.today() - timedelta(days=horizon_days)
+    inactive_since = datetime.utcnow() - timedelta(days=inactive_days)
+
+    counts = {"users": 0, "sessions": 0, "completions": 0, "checkins": 0}
+    after_id = 0
+    while max_users is None or counts["users"] < max_users:
+        limit = batch_users if max_users is None else min(batch_users, max_users - counts["users"])
+        user_ids = candidates(before, inactive_since, after_id, limit)
+        if not user_ids:
+            break
+        for user_id in user_ids:
+            if dry_run:
+                counts["users"] += 1
+                continue
+            archive = archive_user(user_id, before)
+            if archive is None:
+                continue
+            counts["users"] += 1
+            counts["sessions"] += archive.sessions
+            counts["completions"] += archive.completions
+            counts["checkins"] += archive.checkins
+        after_id = user_ids[-1]
+        if progress:
+            progress(dict(counts))
+    return counts
+
+
+def read_archive(archive):
+    """The session documents stored in a HistoryArchive row"""
+    document = json.loads(zlib.decompress(archive.payload))
+    return document["sessions"]
+
+
+def history_totals(user_id):
+    """Lifetime totals, archived ranges included"""
+    archived = db.session.execute(
+        db.select(
+            db.func.coalesce(db.func.sum(HistoryArchive.sessions), 0),
+            db.func.coalesce(db.func.sum(HistoryArchive.completions), 0),
+            db.func.coalesce(db.func.sum(HistoryArchive.checkins), 0),
+            db.func.coalesce(db.func.sum(HistoryArchive.points), 0),
+        ).where(HistoryArchive.user_id == user_id)
+    ).one()
+    live_sessions, live_points = db.session.execute(
+        db.select(db.func.count(), db.func.coalesce(db.func.sum(DailySession.points_earned), 0))
+        .where(DailySession.user_id == user_id)
+    ).one()
+    live_completions = db.session.execute(
+        db.select(db.func.count()).where(ActivityCompletion.user_id == user_id)
+    ).scalar()
+    live_checkins = db.session.execute(
+        db.select(db.func.count()).where(EmotionCheckin.user_id == user_id)
+    ).scalar()
+    return {
+        "sessions": archived[0] + live_sessions,
+        "completions": archived[1] + live_completions,
+        "checkins": archived[2] + live_checkins,
+        "points": archived[3] + live_points,
+    }
+
+
+def export_history(user_id):
+    """All of a user's history, archived and live, oldest first"""
+    sessions = []
+    archives = (
+        HistoryArchive.query.filter_by(user_id=user_id)
+        .order_by(HistoryArchive.period_start).all()
+    )
+    for archive in archives:
+        sessions.extend(read_archive(archive))
+    sessions.extend(_session_documents(*_load(user_id)))
+    return {
+        "user_id": user_id,
+        "sessions": sessions,
+        "totals": history_totals(user_id),
+    }
@@ -1,5 +1,12 @@
 
+import csv
+import itertools
+import time
+from datetime import date
 import click
+import sqlalchemy as sa
+from flask import current_app
+from werkzeug.security import generate_password_hash
 from api.models import db, User
 
 """
@@ -18,17 +25,322 @@ def setup_commands(app):
     @click.argument("count") # argument of out command
     def insert_test_users(count):
         print("Creating test users")
+        # One hash for everybody: hashing is far slower than the insert
+        password_hash = generate_password_hash("123456")
+        users = []
         for x in range(1, int(count) + 1):
             user = User()
             user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
-            user.is_active = True
-            db.session.add(user)
-            db.session.commit()
-            print("User: ", user.email, " created.")
+            user.username = "test_user" + str(x)
+            user.password_hash = password_hash
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
 
-        print("All test users created")
+        print("All test users created:", len(users))
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    """
+    Synthetic users with history (sessions, completions, check-ins) for
+    performance testing, see api/datagen.py. All users share --password.
+    $ flask generate-data --users 10000 --days 90
+    """
+    @app.cli.command("generate-data")
+    @click.option("--users", default=100, help="Number of users")
+    @click.option("--days", default=30, help="Days of history per user")
+    @click.option("--batch-users", default=500, help="Users per insert batch/commit")
+    @click.option("--seed", default=0, help="Random seed (same seed, same data)")
+    @click.option("--password", default="bench-password")
+    def generate_data(users, days, batch_users, seed, password):
+        # Command modules are imported when their command runs, not on every `flask` call
+        from api import datagen
+        start = time.perf_counter()
+
+        def progress(counts):
+            rows = sum(counts.values())
+            elapsed = time.perf_counter() - start
+            print("{users} users, {rows} rows, {rate:.0f} rows/s".format(
+                users=counts["users"], rows=rows, rate=rows / elapsed if elapsed else 0))
+
+        counts = datagen.generate(users, days, seed=seed, batch_users=batch_users,
+                                  password=password, progress=progress)
+        print("Generated:", counts, "in {:.1f}s".format(time.perf_counter() - start))
+
+    """
+    Pre-builds .gz (and .br if the brotli package is installed) files for dist/
+    so they are served compressed without compressing on each request.
+    Run it after `npm run build`: $ flask precompress-static
+    """
+    @app.cli.command("precompress-static")
+    @click.option("--min-size", default=1024, help="Skip files smaller than this (bytes)")
+    def precompress_static(min_size):
+        from api.static_files import precompress
+        root = current_app.config["STATIC_FOLDER"]
+        written = precompress(root, min_size=min_size)
+        print("Precompressed files written:", written)
+
+    """
+    Local stand-in for replication: copies every table from the primary into
+    each DATABASE_REPLICA_URLS database (dropping what was there).
+    Development only: $ FLASK_DEBUG=1 flask replica-sync
+    """
+    @app.cli.command("replica-sync")
+    def replica_sync():
+        if current_app.config["ENV"] != "development":
+            print("replica-sync only runs with FLASK_DEBUG=1")
+            return
+
+        primary = db.engines[None]
+        for key in current_app.config["DB_REPLICA_BINDS"]:
+            replica = db.engines[key]
+            db.metadata.drop_all(replica)
+            db.metadata.create_all(replica)
+            with primary.connect() as src, replica.begin() as dst:
+                for table in db.metadata.sorted_tables:
+                    rows = src.execute(sa.select(table)).mappings().all()
+                    if rows:
+                        dst.execute(table.insert(), [dict(r) for r in rows])
+            print("Replica synced:", key)
+
+    """
+    Deletes expired Idempotency-Key rows. Run it from a daily cron job:
+    $ flask idempotency-cleanup
+    """
+    @app.cli.command("idempotency-cleanup")
+    @click.option("--batch-size", default=5000)
+    def idempotency_cleanup(batch_size):
+        from api.idempotency import delete_expired
+        deleted = delete_expired(batch_size)
+        print("Expired idempotency keys deleted:", deleted)
+
+    """
+    EXPLAINs the hot queries (api/query_plans.py) and fails if one of them
+    reads a table without its index. Run it after migrating:
+    $ flask explain-hot-queries --verbose
+    """
+    @app.cli.command("explain-hot-queries")
+    @click.option("--verbose", is_flag=True, help="Print every plan")
+    def explain_hot_queries(verbose):
+        from api.query_plans import check_hot_queries
+        failed = 0
+        for name, problems, plan in check_hot_queries():
+            print("FAIL" if problems else "ok  ", name, "; ".join(problems))
+            if verbose or problems:
+                print(plan)
+            failed += bool(problems)
+        if failed:
+            raise SystemExit(1)
+
+    """
+    Monthly partitions of the history tables (PostgreSQL, see
+    api/partitions.py). Convert once, in a maintenance window, after
+    `flask db upgrade`:
+    $ flask partitions-convert
+    Then from a monthly cron job:
+    $ flask partitions-create
+    $ flask partitions-detach --older-than 24
+    """
+    @app.cli.command("partitions-convert")
+    @click.option("--months-ahead", type=int, default=None,
+                  help="Default: PARTITION_MONTHS_AHEAD")
+    def partitions_convert(months_ahead):
+        from api import partitions
+        if months_ahead is None:
+            months_ahead = current_app.config["PARTITION_MONTHS_AHEAD"]
+        with db.engine.begin() as conn:
+            if conn.dialect.name != "postgresql":
+                print("Partitioning needs PostgreSQL")
+                return
+            months = partitions.convert(conn, months_ahead)
+        if months:
+            print("History tables partitioned, months:", months[0], "to", months[-1])
+        else:
+            print("History tables were already partitioned; integrity triggers installed")
+
+    @app.cli.command("partitions-revert")
+    def partitions_revert():
+        from api import partitions
+        with db.engine.begin() as conn:
+            reverted = partitions.revert(conn)
+        print("History tables are plain tables again" if reverted else "History tables are not partitioned")
+
+    @app.cli.command("partitions-create")
+    @click.option("--months-ahead", type=int, default=None,
+                  help="Default: PARTITION_MONTHS_AHEAD")
+    def partitions_create(months_ahead):
+        from api import partitions
+        if months_ahead is None:
+            months_ahead = current_app.config["PARTITION_MONTHS_AHEAD"]
+        with db.engine.begin() as conn:
+            if not partitions.is_partitioned(conn):
+                print("History tables are not partitioned")
+                return
+            created = partitions.create_partitions(conn, months_ahead)
+        print("Partitions created:", ", ".join(created) or "none")
+
+    @app.cli.command("partitions-detach")
+    @click.option("--older-than", type=int, required=True, help="Months to keep, counting this one")
+    @click.option("--schema", default="archive", help="Where detached partitions go")
+    @click.option("--drop", is_flag=True, help="Drop them instead")
+    def partitions_detach(older_than, schema, drop):
+        from api import partitions
+        before = partitions.add_months(date.today(), 1 - older_than)
+        with db.engine.begin() as conn:
+            if not partitions.is_partitioned(conn):
+                print("History tables are not partitioned")
+                return
+            detached = partitions.detach_partitions(conn, before, schema=schema, drop=drop)
+        print("Partitions detached:", ", ".join(detached) or "none")
+
+    """
+    Moves old history of inactive users into history_archives (api/archive.py).
+    Safe to stop and rerun; run it nightly or by hand:
+    $ flask archive-history --dry-run
+    """
+    @app.cli.command("archive-history")
+    @click.option("--horizon-days", type=int, default=None, help="Default: ARCHIVE_HORIZON_DAYS")
+    @click.option("--inactive-days", type=int, default=None, help="Default: ARCHIVE_INACTIVE_DAYS")
+    @click.option("--batch-users", default=100)
+    @click.option("--max-users", type=int, default=None)
+    @click.option("--dry-run", is_flag=True, help="Only count the users that would be archived")
+    def archive_history(horizon_days, inactive_days, batch_users, max_users, dry_run):
+        from api import archive
+        config = current_app.config
+        started = time.perf_counter()
+        counts = archive.run_archiver(
+            horizon_days if horizon_days is not None else config["ARCHIVE_HORIZON_DAYS"],
+            inactive_days if inactive_days is not None else config["ARCHIVE_INACTIVE_DAYS"],
+            batch_users=batch_users,
+            max_users=max_users,
+            dry_run=dry_run,
+            progress=lambda c: print("  ", c),
+        )
+        print("Would archive:" if dry_run else "Archived:", counts,
+              "in {:.1f}s".format(time.perf_counter() - started))
+
+    """
+    Deletes accounts and all their data in batches (api/purge.py), either
+    the given ids or, with --retention, those the retention policies select:
+    $ flask purge-users --user-id 12 --user-id 13
+    $ flask purge-users --retention --dry-run
+    """
+    @app.cli.command("purge-users")
+    @click.option("--user-id", "user_ids", type=int, multiple=True)
+    @click.option("--retention", is_flag=True, help="Apply RETENTION_* policies")
+    @click.option("--batch-size", default=5000)
+    @click.option("--dry-run", is_flag=True, help="Only list the accounts")
+    def purge_users_command(user_ids, retention, batch_size, dry_run):
+        from api.purge import purge_users, retention_candidates
+        config = current_app.config
+        pages = [list(user_ids)] if user_ids else []
+        if retention:
+            # Every candidate, a page at a time, not only the first page
+            def retention_pages():
+                after_id = 0
+                while True:
+                    page = retention_candidates(
+                        config["RETENTION_UNVERIFIED_DAYS"], config["RETENTION_DORMANT_DAYS"],
+                        after_id=after_id)
+                    if not page:
+                        return
+                    after_id = page[-1]
+                    yield page
+            pages = itertools.chain(pages, retention_pages())
+
+        started = time.perf_counter()
+        total, counts = 0, {}
+        for page in pages:
+            total += len(page)
+            print("Accounts:", total, page[:20])
+            if dry_run:
+                continue
+            for table, n in purge_users(page, batch_size,
+                                        progress=lambda table, n: print("  ", table, n)).items():
+                counts[table] = counts.get(table, 0) + n
+        if not total:
+            print("No accounts to purge")
+        elif dry_run:
+            print("Would purge:", total, "accounts")
+        else:
+            print("Purged:", total, "accounts", counts,
+                  "in {:.1f}s".format(time.perf_counter() - started))
+
+    """
+    Recomputes the admin dashboard's aggregates (api/dashboard.py). Run it
+    from cron, e.g. every 10 minutes; --metric refreshes only some of them:
+    $ flask refresh-dashboard --metric dau
+    """
+    @app.cli.command("refresh-dashboard")
+    @click.option("--metric", "names", multiple=True, help="A job of api/dashboard.py JOBS (default: all)")
+    @click.option("--days", type=int, default=None, help="Default: DASHBOARD_DAYS")
+    def refresh_dashboard(names, days):
+        from api import dashboard
+        unknown = [name for name in names if name not in dashboard.JOBS]
+        if unknown:
+            raise click.BadParameter(
+                f"{', '.join(unknown)} (choose from {', '.join(dashboard.JOBS)})", param_hint="--metric")
+        started = time.perf_counter()
+        timings = dashboard.refresh(names, days or current_app.config["DASHBOARD_DAYS"])
+        for name, ms in timings.items():
+            print("  ", name, f"{ms} ms")
+        print("Dashboard refreshed in {:.1f}s".format(time.perf_counter() - started))
+
+    """
+    Mails a new verification link to the unverified users created in
+    [--created-from, --created-to) (api/email_verification.py):
+    $ flask resend-verification --created-from 2026-01-01 --created-to 2026-02-01
+    """
+    @app.cli.command("resend-verification")
+    @click.option("--created-from", type=click.DateTime(formats=["%Y-%m-%d"]), required=True)
+    @click.option("--created-to", type=click.DateTime(formats=["%Y-%m-%d"]), required=True)
+    @click.option("--batch-size", default=200, help="Users loaded per query")
+    @click.option("--workers", default=8, help="Concurrent sends")
+    @click.option("--max-per-second", default=10.0, help="Loops rate limit (0 = no pacing)")
+    @click.option("--dry-run", is_flag=True, help="Only count the users")
+    def resend_verification_command(created_from, created_to, batch_size, workers,
+                                    max_per_second, dry_run):
+        from api.email_verification import resend_verification
+        counts = resend_verification(
+            created_from, created_to,
+            batch_size=batch_size,
+            workers=workers,
+            max_per_second=max_per_second,
+            dry_run=dry_run,
+            progress=lambda c: print("  ", c),
+        )
+        print("Would send:" if dry_run else "Sent:", counts)
+
+    """
+    Imports users from a CSV with email, username and optionally password,
+    timezone, is_email_verified columns (api/user_import.py):
+    $ flask import-users partner.csv --rejects rejected.csv
+    """
+    @app.cli.command("import-users")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", default=1000, help="Rows per insert/commit")
+    @click.option("--workers", type=int, default=None, help="Hashing processes (default: CPU count)")
+    @click.option("--rejects", type=click.Path(dir_okay=False), default=None,
+                  help="Write rejected rows (line, email, reason) to this CSV")
+    @click.option("--dry-run", is_flag=True, help="Validate only, nothing is hashed or inserted")
+    def import_users_command(path, batch_size, workers, rejects, dry_run):
+        from api.user_import import import_users
+        counts, rejected = import_users(
+            path,
+            batch_size=batch_size,
+            workers=workers,
+            dry_run=dry_run,
+            progress=lambda c: print("  ", c),
+        )
+        if rejects:
+            with open(rejects, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["line", "email", "reason"])
+                writer.writerows(rejected)
+        else:
+            for line, email, reason in rejected[:20]:
+                print("   rejected:", line, email, reason)
+        print("Would import:" if dry_run else "Imported:", counts,
+              "{:.0f} rows/s".format(counts["read"] / counts["seconds"] if counts["seconds"] else 0))
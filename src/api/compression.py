@@ -0,0 +1,125 @@
+"""
+gzip/brotli compression for /api/* JSON responses.
+
+    COMPRESS_ENABLED=1
+    COMPRESS_MIN_SIZE=1024     bytes; smaller bodies aren't worth the CPU
+    COMPRESS_GZIP_LEVEL=6
+    COMPRESS_BR_QUALITY=4      brotli is only used if the package is installed
+    COMPRESS_CACHE_SIZE=64     compressed bodies kept for @cache_compressed views
+
+Views whose body is the same for everybody (the activity catalog) are marked
+@cache_compressed: their compressed bytes are kept in a small LRU keyed by
+the body, so repeated requests skip the compression step.
+"""
+import collections
+import gzip
+import threading
+from functools import wraps
+from flask import current_app, g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ("application/json",)
+
+
+class CompressedCache:
+    """Small thread-safe LRU: (encoding, body) -> compressed body"""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+def cache_compressed(view):
+    """The response body is shared by all users; cache its compressed form"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.cache_compressed = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _choose_encoding():
+    if brotli is not None and request.accept_encodings.quality("br") > 0:
+        return "br"
+    if request.accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _compress(data, encoding, config):
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESS_BR_QUALITY"])
+    return gzip.compress(data, compresslevel=config["COMPRESS_GZIP_LEVEL"], mtime=0)
+
+
+def compress_response(response):
+    config = current_app.config
+    if (
+        not request.path.startswith("/api/")
+        or response.status_code < 200
+        or response.status_code >= 300
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < config["COMPRESS_MIN_SIZE"]:
+        return response
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    cache = current_app.extensions["compressed_cache"]
+    key = (encoding, data) if g.get("cache_compressed") else None
+    compressed = cache.get(key) if key else None
+    if compressed is None:
+        compressed = _compress(data, encoding, config)
+        if key:
+            cache.put(key, compressed)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    if not app.config["COMPRESS_ENABLED"]:
+        return
+    app.extensions["compressed_cache"] = CompressedCache(app.config["COMPRESS_CACHE_SIZE"])
+    app.after_request(compress_response)
+
+
+def compression_metrics(cache):
+    return [
+        ("api_compressed_cache_hits", "counter", "Compressed bodies served from cache", [({}, cache.hits)]),
+        ("api_compressed_cache_misses", "counter", "Cacheable bodies compressed", [({}, cache.misses)]),
+    ]
@@ -0,0 +1,186 @@
+"""
+Admin dashboard (/admin/dashboard/): signups, DAU, completions per category,
+check-ins per emotion and email outbox health.
+
+The aggregates scan the users and history tables, so the page never runs
+them. `flask refresh-dashboard` (cron, e.g. every 10 minutes) computes each
+metric, reading from a replica when DATABASE_REPLICA_URLS is set, and stores
+the result in dashboard_snapshots. The page only reads those few rows, and
+each worker keeps them in memory for DASHBOARD_CACHE_SECONDS.
+
+    DASHBOARD_DAYS=14               days covered by the daily series
+    DASHBOARD_STALE_SECONDS=1800    snapshots older than this are flagged
+    DASHBOARD_CACHE_SECONDS=60      per-worker cache of the snapshot rows
+
+The outbox has no table of its own: a welcome email is pending while the
+user's welcome_email_sent_at is empty, unless welcome_email_skipped marks
+an account that never gets one (flask import-users, flask generate-data),
+and verification is tracked by is_email_verified.
+"""
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from api.models import (
+    db,
+    User,
+    DailySession,
+    ActivityCompletion,
+    Activity,
+    ActivityCategory,
+    EmotionCheckin,
+    Emotion,
+    Reminder,
+    DashboardSnapshot,
+)
+
+
+def _series(rows, days):
+    """[(day, n)] -> [{"day", "count"}] for each of the last `days` days, zeros included"""
+    counts = {str(day)[:10]: n for day, n in rows}
+    first = date.today() - timedelta(days=days - 1)
+    return [
+        {"day": str(first + timedelta(days=i)), "count": counts.get(str(first + timedelta(days=i)), 0)}
+        for i in range(days)
+    ]
+
+
+def signups(days):
+    since = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+    day = db.func.date(User.created_at)
+    rows = db.session.execute(
+        db.select(day, db.func.count()).where(User.created_at >= since).group_by(day)
+    ).all()
+    total = db.session.execute(db.select(db.func.count()).select_from(User)).scalar()
+    return {"total": total, "days": _series(rows, days)}
+
+
+def dau(days):
+    since = date.today() - timedelta(days=days - 1)
+    rows = db.session.execute(
+        db.select(DailySession.session_date, db.func.count(db.distinct(DailySession.user_id)))
+        .where(DailySession.session_date >= since)
+        .group_by(DailySession.session_date)
+    ).all()
+    return {"days": _series(rows, days)}
+
+
+def completions_by_category(days):
+    since = date.today() - timedelta(days=days - 1)
+    rows = db.session.execute(
+        db.select(ActivityCategory.name, db.func.count(ActivityCompletion.id))
+        .join(Activity, Activity.id == ActivityCompletion.activity_id)
+        .join(ActivityCategory, ActivityCategory.id == Activity.category_id)
+        .where(ActivityCompletion.session_date >= since)
+        .group_by(ActivityCategory.name)
+        .order_by(db.func.count(ActivityCompletion.id).desc())
+    ).all()
+    return {"rows": [{"name": name, "count": n} for name, n in rows]}
+
+
+def checkins_by_emotion(days):
+    since = date.today() - timedelta(days=days - 1)
+    rows = db.session.execute(
+        db.select(Emotion.name, db.func.count(EmotionCheckin.id))
+        .join(Emotion, Emotion.id == EmotionCheckin.emotion_id)
+        .where(EmotionCheckin.session_date >= since)
+        .group_by(Emotion.name)
+        .order_by(db.func.count(EmotionCheckin.id).desc())
+    ).all()
+    return {"rows": [{"name": name, "count": n} for name, n in rows]}
+
+
+def email_outbox(days):
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
+    recent = User.created_at >= since
+    pending = db.and_(User.welcome_email_sent_at.is_(None), User.welcome_email_skipped.is_(False))
+
+    def count(*where):
+        return db.session.execute(db.select(db.func.count()).select_from(User).where(*where)).scalar()
+
+    return {
+        "welcome_sent": count(recent, User.welcome_email_sent_at.is_not(None)),
+        "welcome_pending": count(recent, pending),
+        # Sending happens during the register request: anything older is stuck
+        "welcome_pending_over_1h": count(recent, pending, User.created_at < now - timedelta(hours=1)),
+        "welcome_skipped": count(recent, User.welcome_email_skipped.is_(True)),
+        "verified": count(recent, User.is_email_verified.is_(True)),
+        "unverified": count(recent, User.is_email_verified.is_(False)),
+        "reminders_sent_24h": db.session.execute(
+            db.select(db.func.count()).select_from(Reminder)
+            .where(Reminder.last_sent_at >= now - timedelta(hours=24))
+        ).scalar(),
+    }
+
+
+# name -> job, in the order the page shows them
+JOBS = {
+    "signups": signups,
+    "dau": dau,
+    "completions_by_category": completions_by_category,
+    "checkins_by_emotion": checkins_by_emotion,
+    "email_outbox": email_outbox,
+}
+
+
+def refresh(names=None, days=14):
+    """Run the jobs and store their snapshots; returns {name: milliseconds}"""
+    session = db.session
+    timings = {}
+    for name in names or JOBS:
+        started = time.perf_counter()
+        # Reads go to a replica when there is one (see api/db_routing.py)
+        session.info["use_replica"] = True
+        try:
+            data = JOBS[name](days)
+        finally:
+            session.info.pop("use_replica", None)
+            session.info.pop("replica", None)
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        session.merge(DashboardSnapshot(
+            name=name,
+            payload=json.dumps(data, separators=(",", ":")),
+            computed_at=datetime.utcnow(),
+            duration_ms=duration_ms,
+        ))
+        session.commit()
+        timings[name] = duration_ms
+    return timings
+
+
+class SnapshotCache:
+    """The dashboard_snapshots rows, reloaded at most every `ttl` seconds"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._snapshots = {}
+
+    def get(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._snapshots = {
+                    row.name: {
+                        "data": json.loads(row.payload),
+                        "computed_at": row.computed_at,
+                        "duration_ms": row.duration_ms,
+                    }
+                    for row in DashboardSnapshot.query.all()
+                }
+                self._loaded_at = time.monotonic()
+            return self._snapshots
+
+    def clear(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+def snapshot_cache():
+    cache = current_app.extensions.get("dashboard_snapshots")
+    if cache is None:
+        cache = current_app.extensions["dashboard_snapshots"] = SnapshotCache(
+            current_app.config["DASHBOARD_CACHE_SECONDS"])
+    return cache
@@ -0,0 +1,252 @@
+"""
+Synthetic data for benchmarks and scale testing (`flask generate-data`).
+
+Rows are built as plain dicts and inserted in batches: COPY on PostgreSQL
+with psycopg2, Core executemany elsewhere. Primary keys are assigned here,
+starting after the current max id, so children can point at their parents
+without reading ids back.
+"""
+import csv
+import enum
+import io
+import random
+from datetime import datetime, time, timedelta, timezone
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+from api.models import (
+    db,
+    User,
+    DailySession,
+    Activity,
+    ActivityCategory,
+    ActivityCompletion,
+    Emotion,
+    EmotionCheckin,
+    SessionType,
+    ActivityType,
+)
+
+CATEGORIES = ("Regulación", "Aprendizaje", "Físico", "Emoción")
+EMOTIONS = (
+    ("Calma", 8), ("Alegría", 9), ("Gratitud", 9), ("Cansancio", 4),
+    ("Ansiedad", 3), ("Tristeza", 2), ("Enfado", 2), ("Motivación", 8),
+)
+ACTIVITIES_PER_CATEGORY = 6
+POINTS = (20, 10, 5)
+
+
+def seed_catalog(conn):
+    """Make sure the synthetic catalog exists. Returns (activity ids, emotion ids)"""
+    categories = {
+        name: cid for cid, name in conn.execute(
+            sa.select(ActivityCategory.id, ActivityCategory.name))
+    }
+    for name in CATEGORIES:
+        if name not in categories:
+            categories[name] = conn.execute(
+                sa.insert(ActivityCategory).values(name=name)).inserted_primary_key[0]
+
+    existing = set(conn.execute(sa.select(Activity.external_id)).scalars())
+    new_activities = []
+    for name in CATEGORIES:
+        for i in range(ACTIVITIES_PER_CATEGORY):
+            external_id = f"bench-{name[:3].lower()}-{i}"
+            if external_id in existing:
+                continue
+            new_activities.append({
+                "external_id": external_id,
+                "category_id": categories[name],
+                "name": f"{name} {i}",
+                "activity_type": (ActivityType.day, ActivityType.night, ActivityType.both)[i % 3],
+                "is_active": True,
+            })
+    if new_activities:
+        conn.execute(sa.insert(Activity), new_activities)
+
+    emotions = set(conn.execute(sa.select(Emotion.name)).scalars())
+    new_emotions = [
+        {"name": name, "value": value, "created_at": datetime.utcnow()}
+        for name, value in EMOTIONS if name not in emotions
+    ]
+    if new_emotions:
+        conn.execute(sa.insert(Emotion), new_emotions)
+
+    activity_ids = list(conn.execute(
+        sa.select(Activity.id).where(Activity.is_active.is_(True))).scalars())
+    emotion_ids = list(conn.execute(sa.select(Emotion.id)).scalars())
+    return activity_ids, emotion_ids
+
+
+def _next_id(conn, model):
+    return (conn.execute(sa.select(sa.func.max(model.id))).scalar() or 0) + 1
+
+
+def _reset_sequences(conn):
+    """Explicit ids don't advance PostgreSQL sequences; move them past max(id)"""
+    if conn.dialect.name != "postgresql":
+        return
+    for model in (User, DailySession, ActivityCompletion, EmotionCheckin):
+        table = model.__tablename__
+        conn.execute(sa.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+class Generator:
+    """
+    Builds users with `days` days of history each, `batch_users` users at a
+    time. All users share one password hash (hashing is the slow part).
+    """
+
+    def __init__(self, conn, password="bench-password", seed=0, today=None,
+                 prefix="bench_user"):
+        self.conn = conn
+        self.rng = random.Random(seed)
+        self.today = today or datetime.now(timezone.utc).date()
+        self.prefix = prefix
+        self.password_hash = generate_password_hash(password)
+        self.activity_ids, self.emotion_ids = seed_catalog(conn)
+
+        self.user_id = _next_id(conn, User)
+        self.session_id = _next_id(conn, DailySession)
+        self.completion_id = _next_id(conn, ActivityCompletion)
+        self.checkin_id = _next_id(conn, EmotionCheckin)
+        self.counts = {"users": 0, "sessions": 0, "completions": 0, "checkins": 0}
+
+    def _user_rows(self, user_id, created_at):
+        name = f"{self.prefix}{user_id}"
+        return {
+            "id": user_id,
+            "email": f"{name}@example.com",
+            "username": name,
+            "password_hash": self.password_hash,
+            "timezone": "UTC",
+            "day_start_time": time(6, 0),
+            "night_start_time": time(19, 0),
+            "is_email_verified": True,
+            "created_at": created_at,
+            "welcome_email_skipped": True,
+        }
+
+    def build(self, n_users, days):
+        """Rows for one batch: dict of model -> list of row dicts"""
+        rng = self.rng
+        rows = {User: [], DailySession: [], ActivityCompletion: [], EmotionCheckin: []}
+
+        for _ in range(n_users):
+            user_id = self.user_id
+            self.user_id += 1
+            first_day = self.today - timedelta(days=days - 1)
+            rows[User].append(self._user_rows(
+                user_id, datetime.combine(first_day, time(8, 0))))
+
+            for d in range(days):
+                session_date = first_day + timedelta(days=d)
+                # Not every user shows up every day/night
+                for session_type, hour in ((SessionType.day, 9), (SessionType.night, 21)):
+                    if rng.random() > 0.7:
+                        continue
+                    session_id = self.session_id
+                    self.session_id += 1
+                    started = datetime.combine(session_date, time(hour, 0))
+
+                    points_total = 0
+                    activities = rng.sample(self.activity_ids, min(len(self.activity_ids), rng.randint(1, 4)))
+                    for i, activity_id in enumerate(activities):
+                        points = POINTS[rng.randrange(3)] if i < 3 else 0
+                        points_total += points
+                        rows[ActivityCompletion].append({
+                            "id": self.completion_id,
+                            "daily_session_id": session_id,
+                            "user_id": user_id,
+                            "session_date": session_date,
+                            "activity_id": activity_id,
+                            "points_awarded": points,
+                            "completed_at": started + timedelta(minutes=10 * (i + 1)),
+                        })
+                        self.completion_id += 1
+
+                    if session_type is SessionType.night and rng.random() < 0.8:
+                        rows[EmotionCheckin].append({
+                            "id": self.checkin_id,
+                            "daily_session_id": session_id,
+                            "user_id": user_id,
+                            "session_date": session_date,
+                            "emotion_id": rng.choice(self.emotion_ids),
+                            "intensity": rng.randint(1, 10),
+                            "note": None,
+                            "created_at": started + timedelta(minutes=55),
+                        })
+                        self.checkin_id += 1
+
+                    rows[DailySession].append({
+                        "id": session_id,
+                        "user_id": user_id,
+                        "session_date": session_date,
+                        "session_type": session_type,
+                        "points_earned": points_total,
+                        "is_active": True,
+                        "created_at": started,
+                    })
+        return rows
+
+    def _copy(self, model, rows):
+        """COPY ... FROM STDIN; returns False when the driver can't do it"""
+        with self.conn.connection.dbapi_connection.cursor() as cursor:
+            if not hasattr(cursor, "copy_expert"):
+                return False
+            columns = list(rows[0])
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                writer.writerow([_csv_value(row[c]) for c in columns])
+            buf.seek(0)
+            cursor.copy_expert(
+                f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+        return True
+
+    def insert(self, rows):
+        use_copy = self.conn.dialect.name == "postgresql"
+        # Parents first so foreign keys hold
+        for model in (User, DailySession, ActivityCompletion, EmotionCheckin):
+            if not rows[model]:
+                continue
+            if use_copy and self._copy(model, rows[model]):
+                continue
+            self.conn.execute(sa.insert(model), rows[model])
+        self.counts["users"] += len(rows[User])
+        self.counts["sessions"] += len(rows[DailySession])
+        self.counts["completions"] += len(rows[ActivityCompletion])
+        self.counts["checkins"] += len(rows[EmotionCheckin])
+
+    def run(self, users, days, batch_users=500, progress=None):
+        """Commits after every batch, so an interrupted run keeps what it wrote"""
+        done = 0
+        while done < users:
+            n = min(batch_users, users - done)
+            self.insert(self.build(n, days))
+            self.conn.commit()
+            done += n
+            if progress:
+                progress(dict(self.counts))
+        _reset_sequences(self.conn)
+        self.conn.commit()
+        return self.counts
+
+
+def _csv_value(value):
+    # csv writes None as an empty unquoted field, which COPY reads as NULL
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def generate(users, days, seed=0, batch_users=500, password="bench-password", progress=None):
+    """Generate into db's default engine"""
+    with db.engine.connect() as conn:
+        generator = Generator(conn, password=password, seed=seed)
+        conn.commit()
+        return generator.run(users, days, batch_users, progress)
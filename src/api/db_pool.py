@@ -0,0 +1,115 @@
+"""
+SQLAlchemy engine/pool options from env, plus pool gauges for /metrics.
+
+    DB_POOL_SIZE=5            connections kept open per worker
+    DB_MAX_OVERFLOW=10        extra connections allowed under bursts
+    DB_POOL_TIMEOUT=30        seconds to wait for a free connection
+    DB_POOL_RECYCLE=1800      seconds before a connection is replaced
+    DB_POOL_PRE_PING=1        test connections on checkout (stale connections)
+    DB_STATEMENT_TIMEOUT=0    PostgreSQL statement_timeout in ms (0 = off)
+
+Rule of thumb: workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below
+the database's max_connections.
+"""
+import os
+import threading
+import time
+from sqlalchemy.pool import QueuePool
+
+
+class CheckoutStats:
+    """Time spent waiting for a connection from the pool (per process)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def __init__(self, *args, checkout_stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = checkout_stats or CheckoutStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_stats.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # dispose()/invalidation rebuilds the pool; keep the counters
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def engine_options_from_env(db_url):
+    """Value for SQLALCHEMY_ENGINE_OPTIONS"""
+    options = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1"}
+
+    # SQLite (local dev / tests) keeps SQLAlchemy's default pool
+    if db_url.startswith("sqlite"):
+        return options
+
+    options.update({
+        "poolclass": TimedQueuePool,
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    })
+
+    statement_timeout = _env_int("DB_STATEMENT_TIMEOUT", 0)
+    if statement_timeout and db_url.startswith("postgresql"):
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={statement_timeout}"
+        }
+    return options
+
+
+def pool_metrics(engines):
+    """
+    Gauges for every engine: [(name, type, help, [(labels, value), ...])]
+    `engines` is {bind key: engine}, i.e. db.engines
+    """
+    size, in_use, overflow = [], [], []
+    wait_count, wait_sum, wait_max = [], [], []
+
+    for key, engine in engines.items():
+        pool = engine.pool
+        labels = {"bind": key or "default"}
+        if hasattr(pool, "checkedout"):
+            in_use.append((labels, pool.checkedout()))
+        if isinstance(pool, QueuePool):
+            size.append((labels, pool.size()))
+            overflow.append((labels, max(pool.overflow(), 0)))
+        stats = getattr(pool, "checkout_stats", None)
+        if stats is not None:
+            wait_count.append((labels, stats.count))
+            wait_sum.append((labels, stats.total_seconds))
+            wait_max.append((labels, stats.max_seconds))
+
+    return [
+        ("db_pool_size", "gauge", "Configured pool size", size),
+        ("db_pool_checked_out", "gauge", "Connections currently in use", in_use),
+        ("db_pool_overflow", "gauge", "Overflow connections open", overflow),
+        ("db_pool_checkout_wait_seconds_count", "counter", "Pool checkouts", wait_count),
+        ("db_pool_checkout_wait_seconds_sum", "counter", "Total time waiting for a connection", wait_sum),
+        ("db_pool_checkout_wait_seconds_max", "gauge", "Longest wait for a connection", wait_max),
+    ]
@@ -0,0 +1,129 @@
+"""
+Read-replica routing.
+
+Replicas are listed in DATABASE_REPLICA_URLS (comma separated) and become
+SQLAlchemy binds named replica_1, replica_2... Views decorated with
+@replica_reads send their SELECTs to a replica; everything else, and any
+flush or INSERT/UPDATE/DELETE, goes to the primary. A replica is picked
+once per view call and used for all of its reads, so a response isn't
+built from replicas at different lag.
+
+After a user writes, their reads stay on the primary for
+DB_REPLICA_STICKY_SECONDS so they see their own changes despite replication
+lag. The default store is per worker process; plug a shared one into
+app.extensions["replica_stickiness"] when several workers serve a user.
+"""
+import os
+import random
+import threading
+import time
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, has_request_context
+from flask_sqlalchemy.session import Session
+
+
+def replica_binds_from_env():
+    urls = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+    return {
+        f"replica_{i}": url.replace("postgres://", "postgresql://")
+        for i, url in enumerate(urls, start=1)
+    }
+
+
+class StickinessStore:
+    """user_id -> time until which that user's reads must use the primary"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until = {}
+
+    def mark(self, user_id, seconds):
+        with self._lock:
+            self._until[user_id] = time.monotonic() + seconds
+            # Drop expired entries so the dict stays as small as the write rate
+            if len(self._until) > 10000:
+                now = time.monotonic()
+                self._until = {k: v for k, v in self._until.items() if v > now}
+
+    def is_sticky(self, user_id):
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+def _current_user_id():
+    if not has_request_context():
+        return None
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        # route without @jwt_required
+        return None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that can read from a replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get("use_replica")
+            and not self._flushing
+            and not isinstance(clause, sa.sql.dml.UpdateBase)
+        ):
+            keys = current_app.config.get("DB_REPLICA_BINDS") or []
+            if keys:
+                key = self.info.get("replica")
+                if key not in keys:
+                    key = self.info["replica"] = random.choice(keys)
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def close(self):
+        # The next request may pick another replica
+        self.info.pop("replica", None)
+        super().close()
+
+
+@sa.event.listens_for(RoutingSession, "after_flush")
+def _remember_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@sa.event.listens_for(RoutingSession, "after_commit")
+def _mark_sticky(session):
+    if not session.info.pop("wrote", False):
+        return
+    if not current_app.config.get("DB_REPLICA_BINDS"):
+        return
+    user_id = _current_user_id()
+    if user_id is not None:
+        current_app.extensions["replica_stickiness"].mark(
+            user_id, current_app.config["DB_REPLICA_STICKY_SECONDS"])
+
+
+def init_replicas(app):
+    app.extensions.setdefault("replica_stickiness", StickinessStore())
+
+
+def replica_reads(view):
+    """Route this view's reads to a replica unless the user just wrote"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get("DB_REPLICA_BINDS"):
+            return view(*args, **kwargs)
+
+        user_id = _current_user_id()
+        stickiness = current_app.extensions["replica_stickiness"]
+        if user_id is not None and stickiness.is_sticky(user_id):
+            return view(*args, **kwargs)
+
+        session = current_app.extensions["sqlalchemy"].session
+        session.info["use_replica"] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            session.info.pop("use_replica", None)
+            session.info.pop("replica", None)
+    return wrapper
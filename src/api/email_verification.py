@@ -0,0 +1,153 @@
+"""
+Email verification links (GET /api/verify-email?token=...).
+
+The token is signed (itsdangerous, SECRET_KEY) and holds only the user id
+and a short hash of the email it was sent to, so nothing is stored per
+link. It expires after VERIFY_EMAIL_TTL_HOURS and is single-use: the
+first use sets is_email_verified, after which every link for that account
+is refused, and a link sent to a previous email stops matching.
+
+    VERIFY_EMAIL_TTL_HOURS=24
+    VITE_BACKEND_URL            base of the link (default http://localhost:3001/)
+    VITE_FRONTEND_URL           the link redirects to its auth/verify?status=...
+                                page (default: the SPA this app serves)
+
+`flask resend-verification` mails a new link to the unverified users
+created in a date range, in id batches, through a thread pool sharing one
+keep-alive connection pool to Loops, paced to --max-per-second.
+"""
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from api.models import db, User
+
+SALT = "verify-email"
+
+
+class VerificationError(Exception):
+    """`status` is what the frontend's auth/verify page is told: expired, verified, invalid"""
+
+    def __init__(self, msg, status_code, status):
+        super().__init__(msg)
+        self.msg = msg
+        self.status_code = status_code
+        self.status = status
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=SALT)
+
+
+def _email_hash(email):
+    return hashlib.sha256(email.lower().encode()).hexdigest()[:12]
+
+
+def make_token(user):
+    return _serializer().dumps({"u": user.id, "e": _email_hash(user.email)})
+
+
+def verify_url(token):
+    base = os.getenv("VITE_BACKEND_URL") or "http://localhost:3001/"
+    return base.rstrip("/") + "/api/verify-email?token=" + token
+
+
+def result_url(status):
+    """Frontend page the link lands on: ok, expired, verified or invalid"""
+    base = os.getenv("VITE_FRONTEND_URL") or "/"
+    return base.rstrip("/") + "/auth/verify?status=" + status
+
+
+def verify_token(token):
+    """Mark the token's user as verified; raises VerificationError"""
+    max_age = current_app.config["VERIFY_EMAIL_TTL_HOURS"] * 3600
+    try:
+        data = _serializer().loads(token or "", max_age=max_age)
+    except SignatureExpired:
+        raise VerificationError("El enlace ha caducado, solicita uno nuevo", 410, "expired")
+    except BadSignature:
+        raise VerificationError("Enlace inválido", 400, "invalid")
+
+    user = db.session.get(User, data.get("u"))
+    if user is None or data.get("e") != _email_hash(user.email):
+        raise VerificationError("Enlace inválido", 400, "invalid")
+    if user.is_email_verified:
+        raise VerificationError("El email ya está verificado", 409, "verified")
+
+    user.is_email_verified = True
+    user.email_verified_at = datetime.utcnow()
+    db.session.commit()
+    return user
+
+
+def unverified_users(created_from, created_to, after_id=0, limit=200):
+    """Unverified users created in [created_from, created_to), in id order after `after_id`"""
+    return db.session.execute(
+        db.select(User)
+        .where(
+            User.id > after_id,
+            User.is_email_verified.is_(False),
+            User.created_at >= created_from,
+            User.created_at < created_to,
+        )
+        .order_by(User.id)
+        .limit(limit)
+    ).scalars().all()
+
+
+def resend_verification(created_from, created_to, batch_size=200, workers=8,
+                        max_per_second=10, dry_run=False, progress=None):
+    """Send a new link to every unverified user in the range; returns counts"""
+    # Imported here: pulls in `requests`
+    from api.service_loops.verify_email import LoopsError, pooled_session, send_verify_email
+
+    transactional_id = os.getenv("LOOPS_VERIFY_EMAIL_TRANSACTIONAL_ID")
+    if not transactional_id and not dry_run:
+        raise LoopsError("Falta LOOPS_VERIFY_EMAIL_TRANSACTIONAL_ID")
+
+    counts = {"users": 0, "sent": 0, "failed": 0}
+    started = time.perf_counter()
+    interval = 1.0 / max_per_second if max_per_second else 0
+    next_send = time.perf_counter()
+
+    with pooled_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        after_id = 0
+        while True:
+            users = unverified_users(created_from, created_to, after_id, batch_size)
+            if not users:
+                break
+            after_id = users[-1].id
+            counts["users"] += len(users)
+            if dry_run:
+                continue
+
+            futures = []
+            for user in users:
+                # Pace submissions so Loops' rate limit isn't hit
+                wait = next_send - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                next_send = max(next_send, time.perf_counter()) + interval
+                futures.append(pool.submit(
+                    send_verify_email, user.email, transactional_id, user.username,
+                    verify_url(make_token(user)), session,
+                ))
+            for future in futures:
+                try:
+                    future.result()
+                    counts["sent"] += 1
+                except Exception as e:
+                    counts["failed"] += 1
+                    print("Error Loops verify email (debug):", repr(e))
+
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(dict(counts, per_second=round(counts["sent"] / elapsed, 1) if elapsed else 0))
+            # The users' rows aren't needed any more
+            db.session.expunge_all()
+
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return counts
@@ -0,0 +1,252 @@
+"""
+Live Mirror updates over Server-Sent Events (GET /api/mirror/stream).
+
+Write endpoints call notify(user_id, type, data); the events are published
+once the transaction commits (a rollback drops them) and fanned out to
+that user's open streams. Event types:
+
+    completion   {"date", "activity"}           item as in /api/mirror/today
+    points       {"date", "session"}            session with its new points_earned
+    checkin      {"date", "emotion"}            as /api/mirror/today's "emotion"
+    reset        {"date"}                       reload /api/mirror/today
+    resync       {}                             events were dropped, reload
+
+The default MemoryBroker only reaches streams served by the same worker
+process. With MIRROR_EVENTS_STORAGE_URL=redis://... (RedisBroker, pip install
+redis) events go through Redis pub/sub and every worker delivers them to
+its own streams. Anything with the same subscribe/unsubscribe/publish/streams
+methods can be passed as create_app({"MIRROR_EVENTS_BROKER": broker}).
+
+EventSource can't send an Authorization header, so the token goes in the
+URL (?jwt=), where access logs keep it. The client first asks POST
+/api/mirror/stream-token for a STREAM_TOKEN_SECONDS token scoped to the
+stream (api/revocation.py) and opens the stream with that one; a new
+connection needs a new token.
+
+Each open stream holds a worker thread (gthread) or greenlet (gevent), so
+streams are capped per process (the slot is taken in subscribe(), under the
+broker's lock) and closed after a while, then the client reconnects. Under
+gthread even a few streams eat the threads that serve requests, so the
+stream is only on by default with WEB_WORKER_CLASS=gevent; turned on under
+gthread it gets a quarter of WEB_THREADS. Over the cap, stream-token and
+the stream answer 503 and the front end polls /api/mirror/today instead.
+
+    MIRROR_STREAM_ENABLED=               default 1 with gevent, 0 otherwise
+    MIRROR_STREAM_MAX_CLIENTS=           per worker process; default 50 with gevent, WEB_THREADS // 4
+    MIRROR_STREAM_MAX_SECONDS=300        then the client reconnects
+    MIRROR_STREAM_HEARTBEAT_SECONDS=15   comment line that keeps proxies from closing it
+    MIRROR_EVENTS_STORAGE_URL=           redis://... to share events between workers
+"""
+import json
+import queue
+import threading
+import time
+import sqlalchemy as sa
+from flask import current_app
+from api.db_routing import RoutingSession
+from api.models import db
+
+# Events buffered per stream; a client that falls further behind gets "resync"
+SUBSCRIPTION_QUEUE = 100
+# Lifetime of the ?jwt= token of /api/mirror/stream
+STREAM_TOKEN_SECONDS = 60
+# RedisBroker reconnects after 1, 2, 4... seconds, at most this
+RECONNECT_MAX_SECONDS = 30
+
+
+class Subscription:
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SUBSCRIPTION_QUEUE)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def get(self, timeout):
+        """(type, data); raises queue.Empty after `timeout` seconds"""
+        return self.queue.get(timeout=timeout)
+
+
+class MemoryBroker:
+    """Fan-out to the streams of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id, limit=None):
+        """A Subscription, or None when `limit` streams are already open"""
+        subscription = Subscription(user_id)
+        with self._lock:
+            if limit is not None and self._count() >= limit:
+                return None
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def _count(self):
+        return sum(len(s) for s in self._subscriptions.values())
+
+    def streams(self):
+        with self._lock:
+            return self._count()
+
+    def publish(self, user_id, event):
+        self.published += 1
+        self._deliver(user_id, event)
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        self._put(subscriptions, event)
+
+    def _put(self, subscriptions, event):
+        for subscription in subscriptions:
+            if subscription.put(event):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+
+    def families(self):
+        return [
+            ("mirror_streams", "gauge", "Open /api/mirror/stream connections", [({}, self.streams())]),
+            ("mirror_events_published", "counter", "Mirror events published", [({}, self.published)]),
+            ("mirror_events_delivered", "counter", "Mirror events written to a stream queue", [({}, self.delivered)]),
+            ("mirror_events_dropped", "counter", "Mirror events dropped (stream queue full)", [({}, self.dropped)]),
+        ]
+
+
+class RedisBroker(MemoryBroker):
+    """Events through Redis pub/sub, delivered by a listener thread per process"""
+
+    def __init__(self, client, prefix="mirror:"):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self._listener = None
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def subscribe(self, user_id, limit=None):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, daemon=True)
+                    self._listener.start()
+        return super().subscribe(user_id, limit)
+
+    def publish(self, user_id, event):
+        self.published += 1
+        self.client.publish(f"{self.prefix}{user_id}", json.dumps(event))
+
+    def _listen(self):
+        """Deliver Redis messages for the life of the process, reconnecting on errors"""
+        backoff = 1
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(self.prefix + "*")
+                backoff = 1
+                for message in pubsub.listen():
+                    self._on_message(message)
+            except Exception as e:
+                print("Error mirror events listener, reconnecting (debug):", repr(e))
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            # Events published while disconnected are lost: open streams reload
+            with self._lock:
+                subscriptions = [s for subs in self._subscriptions.values() for s in subs]
+            self._put(subscriptions, ("resync", {}))
+            time.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    def _on_message(self, message):
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        try:
+            user_id = int(channel[len(self.prefix):])
+        except ValueError:
+            return
+        self._deliver(user_id, tuple(json.loads(message["data"])))
+
+
+def init_events(app):
+    broker = app.config.get("MIRROR_EVENTS_BROKER")
+    if broker is None:
+        url = app.config.get("MIRROR_EVENTS_STORAGE_URL")
+        broker = RedisBroker.from_url(url) if url else MemoryBroker()
+    app.extensions["mirror_events"] = broker
+
+
+def notify(user_id, event_type, data):
+    """Publish (type, data) to the user's streams when db.session commits"""
+    db.session.info.setdefault("mirror_events", []).append((user_id, (event_type, data)))
+
+
+@sa.event.listens_for(RoutingSession, "after_commit")
+def _publish_events(session):
+    events = session.info.pop("mirror_events", None)
+    if events and "mirror_events" in current_app.extensions:
+        broker = current_app.extensions["mirror_events"]
+        for user_id, event in events:
+            try:
+                broker.publish(user_id, event)
+            except Exception as e:
+                # The write is committed; a lost event only delays the Mirror
+                print("Error publishing mirror event (debug):", repr(e))
+
+
+@sa.event.listens_for(RoutingSession, "after_rollback")
+def _drop_events(session):
+    session.info.pop("mirror_events", None)
+
+
+def _format(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def stream(broker, subscription, heartbeat, max_seconds):
+    """text/event-stream body with the subscription's events until max_seconds"""
+    try:
+        # EventSource waits this long before reconnecting
+        yield "retry: 3000\n\n"
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if subscription.overflowed:
+                yield _format("resync", {})
+                return
+            try:
+                event_type, data = subscription.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            yield _format(event_type, data)
+    finally:
+        broker.unsubscribe(subscription)
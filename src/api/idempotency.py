@@ -0,0 +1,156 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+stored response of the first attempt, found with one lookup on the
+(scope, key) unique index, instead of running the write and the Loops calls
+again. Keys live IDEMPOTENCY_TTL_HOURS; `flask idempotency-cleanup` deletes
+expired rows.
+
+    same key, same body, finished  -> stored response (Idempotent-Replayed: true)
+    same key, same body, running   -> 409
+    same key, different body       -> 422
+
+The key is claimed (a row without a response) before the view runs. The
+claim only holds for IDEMPOTENCY_LEASE_SECONDS; the stored response gets
+the full TTL. A worker killed mid-request (timeout, OOM, deploy) therefore
+doesn't leave its key answering 409 for a day: once the lease is over, a
+retry reclaims the key and runs the request.
+
+Keys are scoped per user. Anonymous requests (register) are scoped by the
+normalised email of the body, or by client IP when there is none, so two
+clients that happen to pick the same key don't see each other's answers.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, current_app, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError
+from api.models import db, IdempotencyKey
+
+MAX_KEY_LENGTH = 128
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode()).hexdigest()[:24]
+
+
+def email_scope(email):
+    """Scope of requests without a token that carry this email (POST /register)"""
+    return "anon:e:" + _digest(email.strip().lower())
+
+
+def _scope():
+    from flask_jwt_extended import get_jwt_identity
+    from api.rate_limit import client_ip
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        identity = None
+    if identity is not None:
+        return f"user:{identity}"
+    body = request.get_json(silent=True)
+    email = body.get("email") if isinstance(body, dict) else None
+    if isinstance(email, str) and email.strip():
+        return email_scope(email)
+    return "anon:ip:" + _digest(client_ip())
+
+
+def _forget(record_id):
+    db.session.rollback()
+    db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+    db.session.commit()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.status_code,
+                        mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """Honour the Idempotency-Key header on this view (no header: no change)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get("Idempotency-Key") or "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"msg": "Idempotency-Key demasiado largo"}), 400
+
+        scope = _scope()
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        now = datetime.utcnow()
+
+        record = db.session.execute(
+            db.select(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        ).scalar_one_or_none()
+
+        if record is not None and record.expires_at <= now:
+            _forget(record.id)
+            record = None
+
+        if record is not None:
+            if record.request_hash != request_hash:
+                return jsonify({"msg": "Idempotency-Key ya usada con otro contenido"}), 422
+            if record.status_code is None:
+                return jsonify({"msg": "La petición original sigue en curso"}), 409
+            return _replay(record)
+
+        # Claim the key first; a concurrent retry hits the unique constraint
+        record = IdempotencyKey(
+            scope=scope,
+            key=key,
+            endpoint=request.endpoint or "",
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + timedelta(seconds=current_app.config["IDEMPOTENCY_LEASE_SECONDS"]),
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"msg": "La petición original sigue en curso"}), 409
+        record_id = record.id
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _forget(record_id)
+            raise
+
+        # Server errors are not stored, so the client can retry for real
+        if response.status_code >= 500:
+            _forget(record_id)
+            return response
+
+        db.session.execute(
+            db.update(IdempotencyKey)
+            .where(IdempotencyKey.id == record_id)
+            .values(status_code=response.status_code,
+                    response_body=response.get_data(as_text=True),
+                    expires_at=datetime.utcnow() + timedelta(
+                        hours=current_app.config["IDEMPOTENCY_TTL_HOURS"]))
+        )
+        db.session.commit()
+        return response
+    return wrapper
+
+
+def delete_expired(batch_size=5000):
+    """Delete expired keys in batches; returns the number deleted"""
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            db.select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at < datetime.utcnow())
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
@@ -0,0 +1,166 @@
+"""
+Per-endpoint request metrics for /metrics (enabled with METRICS_ENABLED=1).
+
+For every request we record latency, number of SQL statements and time spent
+in SQL (SQLAlchemy cursor events), labelled by Flask endpoint. A jump in
+http_request_sql_queries for one endpoint is usually an N+1. They are
+recorded at teardown, so a view that raises is counted too (status 500).
+
+PROFILE_SAMPLE_RATE (0..1) runs cProfile on that fraction of requests; when a
+profiled request takes longer than PROFILE_SLOW_MS its top functions are kept
+(last PROFILE_KEEP) and shown at GET /metrics/slow.
+"""
+import bisect
+import collections
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import sqlalchemy as sa
+from flask import Response, current_app, g, has_app_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple"""
+
+    def __init__(self, label_names, buckets):
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def families(self, name, help_text):
+        """Prometheus families for api.metrics.render"""
+        buckets, sums, counts = [], [], []
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for label_values, (bucket_counts, total, count) in sorted(snapshot.items()):
+            labels = dict(zip(self.label_names, label_values))
+            running = 0
+            for bound, n in zip(self.buckets, bucket_counts):
+                running += n
+                buckets.append(({**labels, "le": bound}, running))
+            buckets.append(({**labels, "le": "+Inf"}, count))
+            sums.append((labels, total))
+            counts.append((labels, count))
+        # One family with _bucket/_sum/_count lines, as Prometheus expects
+        return [
+            (name, "histogram", help_text, []),
+            (name + "_bucket", "", "", buckets),
+            (name + "_sum", "", "", sums),
+            (name + "_count", "", "", counts),
+        ]
+
+
+class RequestInstrumentation:
+
+    def __init__(self):
+        self.latency = Histogram(("endpoint", "method", "status"), LATENCY_BUCKETS)
+        self.queries = Histogram(("endpoint", "method"), QUERY_BUCKETS)
+        self.sql_time = Histogram(("endpoint", "method"), LATENCY_BUCKETS)
+        self.slow_profiles = collections.deque()
+
+    def init_app(self, app):
+        self.slow_profiles = collections.deque(maxlen=app.config["PROFILE_KEEP"])
+        app.extensions["instrumentation"] = self
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        _listen_sql()
+
+    def _before(self):
+        if request.blueprint == "metrics":
+            return
+        g._instr = {"start": time.perf_counter(), "queries": 0, "sql": 0.0, "profiler": None}
+        rate = current_app.config["PROFILE_SAMPLE_RATE"]
+        if rate and random.random() < rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # another profiler is already active in this thread
+                return
+            g._instr["profiler"] = profiler
+
+    def _after(self, response):
+        state = g.get("_instr")
+        if state is not None:
+            state["status"] = response.status_code
+        return response
+
+    def _teardown(self, exc):
+        # Runs even when the view raised and after_request was skipped
+        state = g.pop("_instr", None)
+        if state is None:
+            return
+        elapsed = time.perf_counter() - state["start"]
+        profiler = state["profiler"]
+        if profiler is not None:
+            profiler.disable()
+
+        labels = (request.endpoint or "unmatched", request.method)
+        status = 500 if exc is not None else state.get("status", 500)
+        self.latency.observe(labels + (str(status),), elapsed)
+        self.queries.observe(labels, state["queries"])
+        self.sql_time.observe(labels, state["sql"])
+
+        if profiler is not None and elapsed * 1000 >= current_app.config["PROFILE_SLOW_MS"]:
+            self._keep_profile(profiler, labels, status, elapsed, state)
+
+    def _keep_profile(self, profiler, labels, status, elapsed, state):
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+        header = "{} {} {} {:.1f} ms, {} queries, {:.1f} ms SQL".format(
+            labels[1], labels[0], status, elapsed * 1000, state["queries"], state["sql"] * 1000)
+        self.slow_profiles.append(header + "\n" + out.getvalue())
+        current_app.logger.warning("Slow request: %s", header)
+
+    def families(self):
+        return (
+            self.latency.families("http_request_duration_seconds", "Request latency")
+            + self.queries.families("http_request_sql_queries", "SQL statements per request")
+            + self.sql_time.families("http_request_sql_seconds", "Time in SQL per request")
+        )
+
+    def slow_report(self):
+        return Response("\n\n".join(self.slow_profiles) or "no slow requests sampled\n",
+                        mimetype="text/plain")
+
+
+_sql_listening = False
+
+
+def _listen_sql():
+    global _sql_listening
+    if _sql_listening:
+        return
+    _sql_listening = True
+
+    @sa.event.listens_for(sa.engine.Engine, "before_cursor_execute")
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        conn.info["_instr_start"] = time.perf_counter()
+
+    @sa.event.listens_for(sa.engine.Engine, "after_cursor_execute")
+    def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("_instr_start", None)
+        if start is not None and has_app_context():
+            state = g.get("_instr")
+            if state is not None:
+                state["queries"] += 1
+                state["sql"] += time.perf_counter() - start
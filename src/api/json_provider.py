@@ -0,0 +1,53 @@
+"""
+JSON provider for jsonify(): orjson when installed, stdlib json otherwise.
+
+Both encode datetimes the way the models' serialize() does (naive UTC ->
+"2026-01-24T22:27:57.304021Z"), dates as ISO strings and enums by value, so
+views can hand rows straight to jsonify without formatting every field.
+"""
+import enum
+from datetime import date, datetime, time
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, datetime):
+        if o.tzinfo is None:
+            return o.isoformat() + "Z"
+        return o.isoformat().replace("+00:00", "Z")
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+    if isinstance(o, enum.Enum):
+        return o.value
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        # response() passes separators (compact) or indent=2 (debug)
+        indent = kwargs.pop("indent", None)
+        kwargs.pop("separators", None)
+        if orjson is None or kwargs or indent not in (None, 2):
+            kwargs.setdefault("default", self.default)
+            if indent is None:
+                kwargs["separators"] = (",", ":")
+            return super().dumps(obj, indent=indent, **kwargs)
+
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
@@ -0,0 +1,68 @@
+"""
+Prometheus text endpoint (GET /metrics), enabled with METRICS_ENABLED=1.
+
+Each part of the app registers a collector: a function returning
+[(name, type, help, [(labels dict, value), ...]), ...]. Values are per
+worker process, so scrape every worker or aggregate by instance.
+If METRICS_TOKEN is set the scraper must send "Authorization: Bearer <token>".
+"""
+import hmac
+from flask import Blueprint, Response, current_app, request
+
+metrics = Blueprint("metrics", __name__)
+
+
+def register_collector(app, collector):
+    app.extensions.setdefault("metrics_collectors", []).append(collector)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def render(families):
+    lines = []
+    for name, metric_type, help_text, samples in families:
+        # Families without a type continue the previous one (histogram parts)
+        if metric_type:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _unauthorized():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        sent = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(sent, "Bearer " + token):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return None
+
+
+@metrics.route("/metrics", methods=["GET"])
+def export_metrics():
+    denied = _unauthorized()
+    if denied:
+        return denied
+
+    families = []
+    for collector in current_app.extensions.get("metrics_collectors", []):
+        families.extend(collector())
+    return Response(render(families), mimetype="text/plain; version=0.0.4")
+
+
+@metrics.route("/metrics/slow", methods=["GET"])
+def slow_requests():
+    """cProfile summaries of sampled slow requests (api/instrumentation.py)"""
+    denied = _unauthorized()
+    if denied:
+        return denied
+    return current_app.extensions["instrumentation"].slow_report()
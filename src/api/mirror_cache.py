@@ -0,0 +1,220 @@
+"""
+Cache of /api/mirror/today and /api/mirror/week response bodies.
+
+Between two writes of a user those views return the same JSON, so views
+marked @mirror_cached("today"|"week") keep the body keyed by
+(user, today's date, variant) and serve it without running their queries.
+
+Two things keep it correct:
+- complete_activity, create_emotion_checkin, create_or_get_session,
+  dev_reset_today and dev_seed_activities_bulk (for the users whose
+  completions it renames) call invalidate_mirror() (applied after commit);
+- they also set users.last_activity_at, and every entry carries the value
+  it was built with. The view's User row (already loaded by mirror_today,
+  one primary key lookup for mirror_week) tells whether a write served by
+  another worker made the entry stale.
+
+    MIRROR_CACHE_ENABLED=1
+    MIRROR_CACHE_SIZE=5000          entries in the per-worker LRU
+    MIRROR_CACHE_TTL_SECONDS=600
+    MIRROR_CACHE_STORAGE_URL=       redis://... to share entries between workers
+
+Anything with get/set/delete can be passed as
+create_app({"MIRROR_CACHE_BACKEND": backend}).
+"""
+import collections
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+import sqlalchemy as sa
+from flask import Response, current_app, request
+from flask_jwt_extended import get_jwt_identity
+from api.db_routing import RoutingSession
+from api.models import db, User
+
+VARIANTS = ("today", "today:day", "today:night", "week")
+
+
+class MemoryBackend:
+    """Thread-safe LRU with a TTL: key -> (stamp, body)"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = collections.OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RedisBackend:
+    """Entries shared through Redis (pip install redis)"""
+
+    def __init__(self, client, ttl, prefix="mirror-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, ttl):
+        import redis
+        return cls(redis.Redis.from_url(url), ttl)
+
+    def _key(self, key):
+        return self.prefix + ":".join(str(part) for part in key)
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return None
+        stamp, body = json.loads(raw)
+        return stamp, body.encode()
+
+    def set(self, key, value):
+        stamp, body = value
+        self.client.setex(self._key(key), self.ttl, json.dumps([stamp, body.decode()]))
+
+    def delete(self, keys):
+        self.client.delete(*(self._key(key) for key in keys))
+
+
+class MirrorCache:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+
+    def get(self, key, stamp):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        if value[0] != stamp:
+            self.stale += 1
+            return None
+        self.hits += 1
+        return value[1]
+
+    def put(self, key, stamp, body):
+        self.backend.set(key, (stamp, body))
+
+    def invalidate(self, user_id, day):
+        self.invalidations += 1
+        self.backend.delete([(user_id, day.isoformat(), variant) for variant in VARIANTS])
+
+    def families(self):
+        lookups = self.hits + self.misses + self.stale
+        families = [
+            ("mirror_cache_lookups", "counter", "Mirror cache lookups by result", [
+                ({"result": "hit"}, self.hits),
+                ({"result": "miss"}, self.misses),
+                ({"result": "stale"}, self.stale),
+            ]),
+            ("mirror_cache_hit_ratio", "gauge", "Mirror cache hits / lookups",
+             [({}, round(self.hits / lookups, 4) if lookups else 0)]),
+            ("mirror_cache_invalidations", "counter", "Mirror cache invalidations", [({}, self.invalidations)]),
+        ]
+        if hasattr(self.backend, "__len__"):
+            families.append(("mirror_cache_entries", "gauge", "Entries in this worker's Mirror cache",
+                             [({}, len(self.backend))]))
+        return families
+
+
+def init_mirror_cache(app):
+    if not app.config["MIRROR_CACHE_ENABLED"]:
+        return
+    backend = app.config.get("MIRROR_CACHE_BACKEND")
+    if backend is None:
+        ttl = app.config["MIRROR_CACHE_TTL_SECONDS"]
+        url = app.config.get("MIRROR_CACHE_STORAGE_URL")
+        backend = RedisBackend.from_url(url, ttl) if url else MemoryBackend(app.config["MIRROR_CACHE_SIZE"], ttl)
+    app.extensions["mirror_cache"] = MirrorCache(backend)
+
+
+def _stamp(user):
+    return user.last_activity_at.isoformat() if user and user.last_activity_at else None
+
+
+def mirror_cached(view_name):
+    """Serve the view's 200 body from the Mirror cache while it is current"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get("mirror_cache")
+            if cache is None:
+                return view(*args, **kwargs)
+
+            try:
+                user_id = int(get_jwt_identity())
+            except (TypeError, ValueError):
+                # The view answers 401 "Token inválido (identity)"
+                return view(*args, **kwargs)
+            today = datetime.now(timezone.utc).date()
+            variant = view_name
+            session_type = (request.args.get("session_type") or "").strip().lower()
+            if view_name == "today" and session_type in ("day", "night"):
+                variant = f"today:{session_type}"
+            key = (user_id, today.isoformat(), variant)
+            # In the identity map afterwards: the view's own User lookup is free
+            stamp = _stamp(db.session.get(User, user_id))
+
+            body = cache.get(key, stamp)
+            if body is not None:
+                return Response(body, mimetype="application/json")
+
+            response = view(*args, **kwargs)
+            rv = current_app.make_response(response)
+            if rv.status_code == 200:
+                cache.put(key, stamp, rv.get_data())
+            return rv
+        return wrapper
+    return decorator
+
+
+def invalidate_mirror(user_id, day):
+    """Drop the user's cached Mirror bodies for `day` when db.session commits"""
+    db.session.info.setdefault("mirror_invalidations", set()).add((user_id, day))
+
+
+@sa.event.listens_for(RoutingSession, "after_commit")
+def _apply_invalidations(session):
+    pending = session.info.pop("mirror_invalidations", None)
+    if pending and "mirror_cache" in current_app.extensions:
+        cache = current_app.extensions["mirror_cache"]
+        for user_id, day in pending:
+            cache.invalidate(user_id, day)
+
+
+@sa.event.listens_for(RoutingSession, "after_rollback")
+def _drop_invalidations(session):
+    session.info.pop("mirror_invalidations", None)
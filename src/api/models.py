@@ -1,13 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, Integer, Time, DateTime, Date, ForeignKey, UniqueConstraint, Index, CheckConstraint
+from sqlalchemy import String, Text, Boolean, Integer, Time, DateTime, Date, ForeignKey, UniqueConstraint, Index, CheckConstraint, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 from datetime import datetime, time
-from sqlalchemy import Enum as SAEnum
+from sqlalchemy import Enum as SAEnum, event, false
 from werkzeug.security import generate_password_hash, check_password_hash
+from api.db_routing import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # ENUMS
 
@@ -76,6 +77,12 @@ class User(db.Model):
     last_activity_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     welcome_email_sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Cuentas importadas o generadas: nunca se les envía la bienvenida
+    welcome_email_skipped: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false())
+
+    # Se incrementa para invalidar todos los tokens emitidos (ver api/revocation.py)
+    token_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    tokens_revoked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
 
     # Relationships
     sessions: Mapped[list["DailySession"]] = relationship(
@@ -114,7 +121,11 @@ class DailySession(db.Model):
     __tablename__ = "daily_sessions"
     __table_args__ = (
         UniqueConstraint("user_id", "session_date", "session_type", name="uq_session_user_date_type"),
-        Index("ix_daily_sessions_user_date", "user_id", "session_date"),
+        # mirror_week reads only these columns: index-only scan on PostgreSQL
+        Index(
+            "ix_daily_sessions_user_date_points", "user_id", "session_date",
+            postgresql_include=["session_type", "points_earned"],
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -177,11 +188,16 @@ class Emotion(db.Model):
             "value": self.value,
             "url_music": self.url_music,
         }
+
+    def __repr__(self):
+        return f"{self.name}"
     
 class EmotionCheckin(db.Model):
     __tablename__ = "emotion_checkins"
     __table_args__ = (
-        Index("ix_emotion_checkins_session", "daily_session_id"),
+        Index("ix_emotion_checkins_session_created", "daily_session_id", "created_at"),
+        # "latest check-in of today" without joining daily_sessions
+        Index("ix_emotion_checkins_user_date_created", "user_id", "session_date", "created_at"),
         Index("ix_emotion_checkins_emotion", "emotion_id"),
         CheckConstraint(
             "intensity >= 1 AND intensity <= 10",
@@ -198,6 +214,12 @@ class EmotionCheckin(db.Model):
         Integer, ForeignKey("emotions.id"), nullable=False
     )
 
+    # Copiados de la sesión (ver _copy_session_keys)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    session_date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+
     intensity: Mapped[int | None] = mapped_column(Integer, nullable=True)
     
     note: Mapped[str | None] = mapped_column(String(300), nullable=True)
@@ -283,8 +305,9 @@ class Activity(db.Model):
 class ActivityCompletion(db.Model):
     __tablename__ = "activity_completions"
     __table_args__ = (
-        Index("ix_activity_completions_session", "daily_session_id"),
         Index("ix_activity_completions_activity", "activity_id"),
+        Index("ix_activity_completions_user_date", "user_id", "session_date"),
+        # Also serves lookups by daily_session_id alone (leading column)
         UniqueConstraint(
             "daily_session_id",
             "activity_id",
@@ -302,6 +325,12 @@ class ActivityCompletion(db.Model):
         Integer, ForeignKey("activities.id"), nullable=False
     )
 
+    # Copiados de la sesión (ver _copy_session_keys)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    session_date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+
     # Guardas el resultado final: 20 / 10 / 5
     # - 0 si ya se alcanzó el límite de 3 actividades con puntos en esa sesión
     points_awarded: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -319,7 +348,28 @@ class ActivityCompletion(db.Model):
             "points_awarded": self.points_awarded,
             "completed_at": self.completed_at.isoformat() + "Z",
         }
-    
+
+
+@event.listens_for(ActivityCompletion, "before_insert")
+@event.listens_for(EmotionCheckin, "before_insert")
+def _copy_session_keys(mapper, connection, target):
+    """
+    user_id/session_date repiten los de la sesión para que las lecturas por
+    usuario y fecha no tengan que unirse a daily_sessions. Las rutas los
+    pasan directamente; esto cubre el resto (admin, scripts).
+    """
+    if target.user_id is not None and target.session_date is not None:
+        return
+    # Sin lazy load dentro del flush: la sesión sólo si ya está cargada
+    session = target.__dict__.get("daily_session")
+    if session is None:
+        session = connection.execute(
+            db.select(DailySession.user_id, DailySession.session_date)
+            .where(DailySession.id == target.daily_session_id)
+        ).one()
+    target.user_id = session.user_id
+    target.session_date = session.session_date
+
 # GOALS  SESSIONLINK  PROGRESS
 
 class Goal(db.Model):
@@ -487,4 +537,102 @@ class Reminder(db.Model):
             "days_of_week": self.days_of_week,
             "last_sent_at": self.last_sent_at.isoformat() + "Z" if self.last_sent_at else None,
             "is_active": self.is_active,
-        }
\ No newline at end of file
+        }
+# IDEMPOTENCY (retries de clientes móviles)
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_scope_key"),
+        Index("ix_idempotency_keys_expires", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # "user:<id>" para rutas con JWT; en register "anon:e:<hash del email>"
+    # (o "anon:ip:<hash de la IP>" si no hay email)
+    scope: Mapped[str] = mapped_column(String(40), nullable=False)
+    key: Mapped[str] = mapped_column(String(128), nullable=False)
+    endpoint: Mapped[str] = mapped_column(String(80), nullable=False)
+    # sha256 del body: la misma key con otro body es un error del cliente
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    # NULL mientras la primera petición sigue en curso
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "scope": self.scope,
+            "key": self.key,
+            "endpoint": self.endpoint,
+            "status_code": self.status_code,
+            "created_at": self.created_at.isoformat() + "Z",
+            "expires_at": self.expires_at.isoformat() + "Z",
+        }
+
+
+# ARCHIVO (historial frío, ver api/archive.py)
+
+class HistoryArchive(db.Model):
+    __tablename__ = "history_archives"
+    __table_args__ = (
+        Index("ix_history_archives_user_period", "user_id", "period_start"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+
+    # Rango de session_date archivado en esta fila
+    period_start: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    period_end: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+
+    # Totales del rango, para no tener que descomprimir el payload
+    sessions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    checkins: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    points: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # JSON comprimido con zlib; `version` es el formato del JSON
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "period_start": self.period_start.isoformat(),
+            "period_end": self.period_end.isoformat(),
+            "sessions": self.sessions,
+            "completions": self.completions,
+            "checkins": self.checkins,
+            "points": self.points,
+            "created_at": self.created_at.isoformat() + "Z",
+        }
+
+
+# DASHBOARD (agregados precalculados, ver api/dashboard.py)
+
+class DashboardSnapshot(db.Model):
+    __tablename__ = "dashboard_snapshots"
+
+    # Una fila por métrica: "signups", "dau", ...
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    # Resultado del job en JSON
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+
+    computed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    duration_ms: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"{self.name}"
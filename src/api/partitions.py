@@ -0,0 +1,304 @@
+"""
+Monthly range partitions for the history tables (PostgreSQL only, optional).
+
+Partitioning is an ops step, not a migration, so every revision means the
+same schema everywhere:
+
+    $ flask partitions-convert    rebuilds daily_sessions, activity_completions
+                                  and emotion_checkins as tables partitioned
+                                  by session_date, one partition per month
+    $ flask partitions-revert     back to plain tables
+
+Both copy the rows in one transaction holding an exclusive lock on the three
+tables: plan for a maintenance window on a large database. Run `flask db
+upgrade` before converting, and autogenerate migrations against an
+unpartitioned database.
+
+    PARTITION_MONTHS_AHEAD=3    months kept ready by partitions-convert and
+                                `flask partitions-create`
+
+Partitions are named <table>_pYYYYMM, plus <table>_default for rows outside
+every created month. Run `flask partitions-create` from a monthly cron job: if
+it stops, new rows land in the default partition and that month has to be
+moved out of it by hand before its partition can be created.
+
+The models don't change. The database key becomes (id, session_date), since
+PostgreSQL requires the partition key in every unique constraint, but ids
+still come from the table's sequence and the ORM keeps mapping `id`.
+Completions and check-ins carry session_date (user-039), so their foreign
+key to daily_sessions is (daily_session_id, session_date) and a month's
+rows of the three tables live in partitions with the same suffix.
+
+daily_session_goals and goal_progress have no session_date and can't keep
+a foreign key to the partitioned daily_sessions. Triggers do its work: on
+insert/update they check the session exists (locking it FOR KEY SHARE, as a
+foreign key would), and deleting a session deletes its goals and clears
+goal_progress.daily_session_id (the old CASCADE / SET NULL).
+
+`flask partitions-detach --older-than 24` detaches the months before that
+horizon, referencing tables first, and moves them to an archive schema
+(or drops them with --drop).
+"""
+import re
+from datetime import date
+from sqlalchemy import text
+
+HISTORY_TABLES = ("daily_sessions", "activity_completions", "emotion_checkins")
+# Tables whose foreign keys point at daily_sessions go first
+DETACH_ORDER = ("emotion_checkins", "activity_completions", "daily_sessions")
+PARTITION_NAME = re.compile(r"^(?P<table>\w+?)_(?:p(?P<month>\d{6})|default)$")
+
+PARTITIONED_CONSTRAINTS = {
+    "daily_sessions": [
+        "ALTER TABLE daily_sessions ADD CONSTRAINT daily_sessions_pkey PRIMARY KEY (id, session_date)",
+        "ALTER TABLE daily_sessions ADD CONSTRAINT uq_session_user_date_type UNIQUE (user_id, session_date, session_type)",
+        "ALTER TABLE daily_sessions ADD CONSTRAINT daily_sessions_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        "CREATE INDEX ix_daily_sessions_user_date_points ON daily_sessions (user_id, session_date) INCLUDE (session_type, points_earned)",
+    ],
+    "activity_completions": [
+        "ALTER TABLE activity_completions ADD CONSTRAINT activity_completions_pkey PRIMARY KEY (id, session_date)",
+        "ALTER TABLE activity_completions ADD CONSTRAINT uq_session_activity UNIQUE (daily_session_id, activity_id, session_date)",
+        "ALTER TABLE activity_completions ADD CONSTRAINT activity_completions_daily_session_id_fkey FOREIGN KEY (daily_session_id, session_date) REFERENCES daily_sessions (id, session_date) ON DELETE CASCADE",
+        "ALTER TABLE activity_completions ADD CONSTRAINT activity_completions_activity_id_fkey FOREIGN KEY (activity_id) REFERENCES activities (id)",
+        "ALTER TABLE activity_completions ADD CONSTRAINT fk_activity_completions_user_id FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        "CREATE INDEX ix_activity_completions_activity ON activity_completions (activity_id)",
+        "CREATE INDEX ix_activity_completions_user_date ON activity_completions (user_id, session_date)",
+    ],
+    "emotion_checkins": [
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT emotion_checkins_pkey PRIMARY KEY (id, session_date)",
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT emotion_checkins_daily_session_id_fkey FOREIGN KEY (daily_session_id, session_date) REFERENCES daily_sessions (id, session_date) ON DELETE CASCADE",
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT emotion_checkins_emotion_id_fkey FOREIGN KEY (emotion_id) REFERENCES emotions (id)",
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT fk_emotion_checkins_user_id FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        "CREATE INDEX ix_emotion_checkins_session_created ON emotion_checkins (daily_session_id, created_at)",
+        "CREATE INDEX ix_emotion_checkins_user_date_created ON emotion_checkins (user_id, session_date, created_at)",
+        "CREATE INDEX ix_emotion_checkins_emotion ON emotion_checkins (emotion_id)",
+    ],
+}
+
+# The same tables as the models (and the migrations) define them
+PLAIN_CONSTRAINTS = {
+    "daily_sessions": [
+        "ALTER TABLE daily_sessions ADD CONSTRAINT daily_sessions_pkey PRIMARY KEY (id)",
+        "ALTER TABLE daily_sessions ADD CONSTRAINT uq_session_user_date_type UNIQUE (user_id, session_date, session_type)",
+        "ALTER TABLE daily_sessions ADD CONSTRAINT daily_sessions_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        "CREATE INDEX ix_daily_sessions_user_date_points ON daily_sessions (user_id, session_date) INCLUDE (session_type, points_earned)",
+    ],
+    "activity_completions": [
+        "ALTER TABLE activity_completions ADD CONSTRAINT activity_completions_pkey PRIMARY KEY (id)",
+        "ALTER TABLE activity_completions ADD CONSTRAINT uq_session_activity UNIQUE (daily_session_id, activity_id)",
+        "ALTER TABLE activity_completions ADD CONSTRAINT activity_completions_daily_session_id_fkey FOREIGN KEY (daily_session_id) REFERENCES daily_sessions (id) ON DELETE CASCADE",
+        "ALTER TABLE activity_completions ADD CONSTRAINT activity_completions_activity_id_fkey FOREIGN KEY (activity_id) REFERENCES activities (id)",
+        "ALTER TABLE activity_completions ADD CONSTRAINT fk_activity_completions_user_id FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        "CREATE INDEX ix_activity_completions_activity ON activity_completions (activity_id)",
+        "CREATE INDEX ix_activity_completions_user_date ON activity_completions (user_id, session_date)",
+    ],
+    "emotion_checkins": [
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT emotion_checkins_pkey PRIMARY KEY (id)",
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT emotion_checkins_daily_session_id_fkey FOREIGN KEY (daily_session_id) REFERENCES daily_sessions (id) ON DELETE CASCADE",
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT emotion_checkins_emotion_id_fkey FOREIGN KEY (emotion_id) REFERENCES emotions (id)",
+        "ALTER TABLE emotion_checkins ADD CONSTRAINT fk_emotion_checkins_user_id FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        "CREATE INDEX ix_emotion_checkins_session_created ON emotion_checkins (daily_session_id, created_at)",
+        "CREATE INDEX ix_emotion_checkins_user_date_created ON emotion_checkins (user_id, session_date, created_at)",
+        "CREATE INDEX ix_emotion_checkins_emotion ON emotion_checkins (emotion_id)",
+    ],
+}
+
+# Foreign keys to daily_sessions.id that partitioning replaces with triggers
+SESSION_FOREIGN_KEYS = [
+    "ALTER TABLE daily_session_goals ADD CONSTRAINT daily_session_goals_daily_session_id_fkey "
+    "FOREIGN KEY (daily_session_id) REFERENCES daily_sessions (id) ON DELETE CASCADE",
+    "ALTER TABLE goal_progress ADD CONSTRAINT goal_progress_daily_session_id_fkey "
+    "FOREIGN KEY (daily_session_id) REFERENCES daily_sessions (id) ON DELETE SET NULL",
+]
+
+# Can be rerun: installs what's missing on a database partitioned without them
+SESSION_TRIGGERS = [
+    """CREATE OR REPLACE FUNCTION daily_session_exists() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.daily_session_id IS NOT NULL THEN
+        PERFORM 1 FROM daily_sessions WHERE id = NEW.daily_session_id FOR KEY SHARE;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'daily_session_id % not present in daily_sessions', NEW.daily_session_id
+                USING ERRCODE = 'foreign_key_violation';
+        END IF;
+    END IF;
+    RETURN NEW;
+END
+$$""",
+    "DROP TRIGGER IF EXISTS trg_daily_session_goals_session ON daily_session_goals",
+    "CREATE TRIGGER trg_daily_session_goals_session BEFORE INSERT OR UPDATE OF daily_session_id "
+    "ON daily_session_goals FOR EACH ROW EXECUTE FUNCTION daily_session_exists()",
+    "DROP TRIGGER IF EXISTS trg_goal_progress_session ON goal_progress",
+    "CREATE TRIGGER trg_goal_progress_session BEFORE INSERT OR UPDATE OF daily_session_id "
+    "ON goal_progress FOR EACH ROW EXECUTE FUNCTION daily_session_exists()",
+    """CREATE OR REPLACE FUNCTION daily_sessions_delete_dependents() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM daily_session_goals WHERE daily_session_id = OLD.id;
+    UPDATE goal_progress SET daily_session_id = NULL WHERE daily_session_id = OLD.id;
+    RETURN OLD;
+END
+$$""",
+    "DROP TRIGGER IF EXISTS trg_daily_sessions_delete_dependents ON daily_sessions",
+    "CREATE TRIGGER trg_daily_sessions_delete_dependents AFTER DELETE ON daily_sessions "
+    "FOR EACH ROW EXECUTE FUNCTION daily_sessions_delete_dependents()",
+]
+
+DROP_SESSION_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS trg_daily_sessions_delete_dependents ON daily_sessions",
+    "DROP TRIGGER IF EXISTS trg_goal_progress_session ON goal_progress",
+    "DROP TRIGGER IF EXISTS trg_daily_session_goals_session ON daily_session_goals",
+    "DROP FUNCTION IF EXISTS daily_sessions_delete_dependents()",
+    "DROP FUNCTION IF EXISTS daily_session_exists()",
+]
+
+
+def add_months(d, n):
+    """First day of the month n months after d's"""
+    month = d.month - 1 + n
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def parent_table(relation):
+    """daily_sessions_p202610 -> daily_sessions; other names unchanged"""
+    match = PARTITION_NAME.match(relation)
+    if match and match.group("table") in HISTORY_TABLES:
+        return match.group("table")
+    return relation
+
+
+def is_partitioned(conn, table="daily_sessions"):
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"),
+        {"t": table},
+    ).scalar()
+
+
+def list_partitions(conn, table):
+    """[(partition name, first day of its month or None for the default)]"""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t) ORDER BY c.relname"
+    ), {"t": table}).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        month = match.group("month") if match else None
+        partitions.append((name, date(int(month[:4]), int(month[4:]), 1) if month else None))
+    return partitions
+
+
+def _execute(conn, statements):
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _rebuild(conn, months):
+    """Copy the three tables into new ones (partitioned if months are given) and swap them in"""
+    # Nothing writes to them while they are copied
+    conn.execute(text(f"LOCK TABLE {', '.join(HISTORY_TABLES)} IN ACCESS EXCLUSIVE MODE"))
+    for table in HISTORY_TABLES:
+        partition_by = " PARTITION BY RANGE (session_date)" if months else ""
+        conn.execute(text(
+            f"CREATE TABLE {table}_new (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}"))
+        for month in months:
+            conn.execute(text(
+                f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table}_new "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+        if months:
+            conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table}_new DEFAULT"))
+        conn.execute(text(f"INSERT INTO {table}_new SELECT * FROM {table}"))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}_new.id"))
+
+    # CASCADE also drops the foreign keys other tables had to these
+    conn.execute(text(f"DROP TABLE {', '.join(DETACH_ORDER)} CASCADE"))
+    constraints = PARTITIONED_CONSTRAINTS if months else PLAIN_CONSTRAINTS
+    for table in HISTORY_TABLES:
+        conn.execute(text(f"ALTER TABLE {table}_new RENAME TO {table}"))
+        _execute(conn, constraints[table])
+
+
+def convert(conn, months_ahead, today=None):
+    """Partition the history tables by month; returns the months created"""
+    if conn.dialect.name != "postgresql":
+        raise RuntimeError("Partitioning needs PostgreSQL")
+    if is_partitioned(conn):
+        # Converted before the integrity triggers existed
+        _execute(conn, SESSION_TRIGGERS)
+        return []
+    first = (today or date.today()).replace(day=1)
+    last = add_months(first, months_ahead)
+    oldest = conn.execute(text("SELECT MIN(session_date) FROM daily_sessions")).scalar()
+    month = min(oldest.replace(day=1), first) if oldest else first
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    _rebuild(conn, months)
+    _execute(conn, SESSION_TRIGGERS)
+    return months
+
+
+def revert(conn):
+    """Merge the partitions back into plain tables; False if they weren't partitioned"""
+    if not is_partitioned(conn):
+        return False
+    _execute(conn, DROP_SESSION_TRIGGERS)
+    _rebuild(conn, [])
+    _execute(conn, SESSION_FOREIGN_KEYS)
+    return True
+
+
+def create_partitions(conn, months_ahead, today=None):
+    """Create this month's and the next months_ahead partitions; returns the new names"""
+    first = (today or date.today()).replace(day=1)
+    created = []
+    for table in HISTORY_TABLES:
+        existing = {name for name, _ in list_partitions(conn, table)}
+        for i in range(months_ahead + 1):
+            month = add_months(first, i)
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+            created.append(name)
+    return created
+
+
+def _drop_foreign_keys(conn, table):
+    # A detached partition keeps copies of the parent's foreign keys; the one
+    # to daily_sessions would block detaching that month of daily_sessions
+    names = conn.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:t) AND contype = 'f'"
+    ), {"t": table}).scalars().all()
+    for name in names:
+        conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+
+
+def detach_partitions(conn, before, schema="archive", drop=False):
+    """Detach every monthly partition older than `before`; returns their names"""
+    detached = []
+    if not drop:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    for table in DETACH_ORDER:
+        for name, month in list_partitions(conn, table):
+            if month is None or month >= before:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            _drop_foreign_keys(conn, name)
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            else:
+                conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+            detached.append(name)
+    return detached
@@ -0,0 +1,67 @@
+"""
+Points ledger of a user's day (GET /api/points/today), computed from
+activity_completions, the same rows complete_activity writes
+DailySession.points_earned from.
+
+The day's completions are read in one query on ix_activity_completions_user_date
+and summed per activity (external_id) across the day and night sessions:
+{total, ledger: {external_id: points}} is what src/front/services/pointsService.js
+keeps.
+
+Completions are only ever inserted or deleted, so "<max id>.<count>" identifies
+the state of a day. A client sends the version it has (?since=) and gets back
+only the completions added since; if some were deleted meanwhile (the counts
+don't add up) it gets the full ledger instead.
+"""
+from api.models import db, Activity, ActivityCompletion
+
+
+def day_completions(user_id, day):
+    """[(completion id, activity external_id, points)] in id order"""
+    return db.session.execute(
+        db.select(ActivityCompletion.id, Activity.external_id, ActivityCompletion.points_awarded)
+        .join(Activity, Activity.id == ActivityCompletion.activity_id)
+        .where(ActivityCompletion.user_id == user_id, ActivityCompletion.session_date == day)
+        .order_by(ActivityCompletion.id)
+    ).all()
+
+
+def _ledger(rows):
+    ledger = {}
+    for _, external_id, points in rows:
+        ledger[external_id] = ledger.get(external_id, 0) + points
+    return ledger
+
+
+def parse_version(version):
+    """'1523.4' -> (1523, 4); None for anything else"""
+    try:
+        last_id, count = (int(part) for part in (version or "").split("."))
+    except ValueError:
+        return None
+    return last_id, count
+
+
+def points_state(user_id, day, since=None):
+    """The day's ledger, or only what changed after the `since` version"""
+    rows = day_completions(user_id, day)
+    version = f"{rows[-1][0] if rows else 0}.{len(rows)}"
+    state = {
+        "date": day.isoformat(),
+        "version": version,
+        "total": sum(points for _, _, points in rows),
+    }
+
+    known = parse_version(since)
+    if known is not None:
+        last_id, count = known
+        added = [row for row in rows if row[0] > last_id]
+        # Nothing deleted since that version: the new rows are the whole change
+        if count + len(added) == len(rows):
+            state["full"] = False
+            state["changes"] = _ledger(added)
+            return state
+
+    state["full"] = True
+    state["ledger"] = _ledger(rows)
+    return state
@@ -0,0 +1,114 @@
+"""
+Account purge: deletes users and everything hanging from them without
+loading it into the session.
+
+Deleting a User through the ORM loads every session, completion, check-in,
+goal and reminder first (the relationships cascade "all, delete-orphan").
+purge_users() instead deletes table by table, children before parents, in
+batches of `batch_size` ids committed one by one, so locks and
+transactions stay short. The users rows go last: a purge that stops half
+way leaves the accounts in place and rerunning it finishes the job. On
+PostgreSQL the ondelete="CASCADE" foreign keys would delete the same rows;
+doing it in batches here keeps one DELETE from touching years of history.
+
+Used by DELETE /api/me and by `flask purge-users`, which also applies the
+retention policies:
+
+    RETENTION_UNVERIFIED_DAYS=0    accounts still unverified after this many days
+    RETENTION_DORMANT_DAYS=0       accounts not seen for this many days
+                                   (0 disables a policy; both are off by default)
+"""
+from datetime import datetime, timedelta
+from api.models import (
+    db,
+    User,
+    DailySession,
+    ActivityCompletion,
+    EmotionCheckin,
+    Goal,
+    DailySessionGoal,
+    GoalProgress,
+    Reminder,
+    HistoryArchive,
+    IdempotencyKey,
+)
+from api.idempotency import email_scope
+
+
+def _delete_in_batches(model, where, batch_size):
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            db.select(model.id).where(where).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(db.delete(model).where(model.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+
+
+def _steps(user_ids):
+    """(table, model, condition) in FK-safe order"""
+    sessions = db.select(DailySession.id).where(DailySession.user_id.in_(user_ids))
+    goals = db.select(Goal.id).where(Goal.user_id.in_(user_ids))
+    # Anonymous rows (POST /register) are keyed by the email and keep a
+    # response body with it
+    emails = db.session.execute(db.select(User.email).where(User.id.in_(user_ids))).scalars()
+    scopes = [f"user:{user_id}" for user_id in user_ids] + [email_scope(email) for email in emails]
+    return [
+        ("emotion_checkins", EmotionCheckin, EmotionCheckin.user_id.in_(user_ids)),
+        ("activity_completions", ActivityCompletion, ActivityCompletion.user_id.in_(user_ids)),
+        ("daily_session_goals", DailySessionGoal, db.or_(
+            DailySessionGoal.daily_session_id.in_(sessions), DailySessionGoal.goal_id.in_(goals))),
+        ("goal_progress", GoalProgress, GoalProgress.goal_id.in_(goals)),
+        ("daily_sessions", DailySession, DailySession.user_id.in_(user_ids)),
+        ("goals", Goal, Goal.user_id.in_(user_ids)),
+        ("reminders", Reminder, Reminder.user_id.in_(user_ids)),
+        ("history_archives", HistoryArchive, HistoryArchive.user_id.in_(user_ids)),
+        ("idempotency_keys", IdempotencyKey, IdempotencyKey.scope.in_(scopes)),
+        ("users", User, User.id.in_(user_ids)),
+    ]
+
+
+def purge_users(user_ids, batch_size=5000, progress=None):
+    """Delete the users and all their rows; returns {table: rows deleted}"""
+    user_ids = list(user_ids)
+    counts = {}
+    if not user_ids:
+        return counts
+    # Progress of other users' goals may point at these sessions (SET NULL)
+    db.session.execute(
+        db.update(GoalProgress)
+        .where(GoalProgress.daily_session_id.in_(
+            db.select(DailySession.id).where(DailySession.user_id.in_(user_ids))))
+        .values(daily_session_id=None)
+    )
+    db.session.commit()
+    for table, model, where in _steps(user_ids):
+        counts[table] = _delete_in_batches(model, where, batch_size)
+        if progress:
+            progress(table, counts[table])
+    return counts
+
+
+def retention_candidates(unverified_days, dormant_days, after_id=0, limit=1000):
+    """
+    Ids of accounts the retention policies remove (0 days disables a policy),
+    one page of `limit` in id order after `after_id`
+    """
+    now = datetime.utcnow()
+    policies = []
+    if unverified_days:
+        policies.append(db.and_(
+            User.is_email_verified.is_(False),
+            User.created_at < now - timedelta(days=unverified_days),
+        ))
+    if dormant_days:
+        last_seen = db.func.coalesce(User.last_activity_at, User.last_login_at, User.created_at)
+        policies.append(last_seen < now - timedelta(days=dormant_days))
+    if not policies:
+        return []
+    return db.session.execute(
+        db.select(User.id).where(User.id > after_id, db.or_(*policies)).order_by(User.id).limit(limit)
+    ).scalars().all()
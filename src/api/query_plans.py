@@ -0,0 +1,165 @@
+"""
+EXPLAIN checks for the hot queries.
+
+Each entry builds the same statement a view runs and names, per table, the
+index the plan must use. `flask explain-hot-queries` prints the verdicts and
+exits with status 1 if any table is read with a sequential scan, so it can
+run in CI against a migrated PostgreSQL database.
+
+Sequential scans are disabled for the check: on a small database the planner
+rightly prefers them, and the question here is whether an index *can* serve
+the query. On SQLite only "no full scan" is checked (index names differ).
+
+With partitioned history tables (api/partitions.py) the partitions' indexes
+have generated names, so only the scan type is checked, and the queries in
+DATE_BOUNDED must be pruned to at most two monthly partitions.
+"""
+import json
+from datetime import date, timedelta
+from sqlalchemy import text
+from api.partitions import parent_table
+from api.models import (
+    db, Activity, ActivityCompletion, DailySession, EmotionCheckin, SessionType,
+)
+
+
+def _activity_by_external_id():
+    return db.select(Activity).where(
+        Activity.external_id == "breathing-4-7-8", Activity.is_active.is_(True)
+    ).limit(1)
+
+
+def _session_by_user_date_type():
+    return db.select(DailySession).where(
+        DailySession.user_id == 1,
+        DailySession.session_date == date.today(),
+        DailySession.session_type == SessionType.day,
+    ).limit(1)
+
+
+def _sessions_for_week():
+    today = date.today()
+    return db.select(
+        DailySession.session_date, DailySession.session_type, DailySession.points_earned
+    ).where(
+        DailySession.user_id == 1,
+        DailySession.session_date >= today - timedelta(days=6),
+        DailySession.session_date <= today,
+    )
+
+
+def _latest_checkin_today():
+    return (
+        db.select(EmotionCheckin)
+        .where(EmotionCheckin.user_id == 1, EmotionCheckin.session_date == date.today())
+        .order_by(EmotionCheckin.created_at.desc())
+        .limit(1)
+    )
+
+
+def _completion_exists():
+    return db.select(ActivityCompletion).where(
+        ActivityCompletion.daily_session_id == 1,
+        ActivityCompletion.session_date == date.today(),
+        ActivityCompletion.activity_id == 1,
+    ).limit(1)
+
+
+def _completions_for_session():
+    return db.select(ActivityCompletion).where(ActivityCompletion.daily_session_id == 1)
+
+
+def _completions_for_user_day():
+    return db.select(ActivityCompletion).where(
+        ActivityCompletion.user_id == 1, ActivityCompletion.session_date == date.today()
+    )
+
+
+# (name, statement builder, {table: index expected on PostgreSQL})
+HOT_QUERIES = [
+    ("activity_by_external_id", _activity_by_external_id,
+     {"activities": "ix_activities_external_id"}),
+    ("session_by_user_date_type", _session_by_user_date_type,
+     {"daily_sessions": "uq_session_user_date_type"}),
+    ("sessions_for_week", _sessions_for_week,
+     {"daily_sessions": "ix_daily_sessions_user_date_points"}),
+    ("latest_checkin_today", _latest_checkin_today,
+     {"emotion_checkins": "ix_emotion_checkins_user_date_created"}),
+    ("completion_exists", _completion_exists,
+     {"activity_completions": "uq_session_activity"}),
+    ("completions_for_session", _completions_for_session,
+     {"activity_completions": "uq_session_activity"}),
+    ("completions_for_user_day", _completions_for_user_day,
+     {"activity_completions": "ix_activity_completions_user_date"}),
+]
+
+# Filter on session_date: a week touches at most two months
+DATE_BOUNDED = {
+    "session_by_user_date_type",
+    "sessions_for_week",
+    "latest_checkin_today",
+    "completion_exists",
+    "completions_for_user_day",
+}
+MAX_PARTITIONS = 2
+
+
+def _pg_scans(plan, scans=None):
+    """{table: [(node type, index name, relation)]} for every scan in a JSON plan"""
+    scans = {} if scans is None else scans
+    children = plan.get("Plans", [])
+    if "Relation Name" in plan:
+        index = plan.get("Index Name")
+        if plan["Node Type"] == "Bitmap Heap Scan":
+            index = next((c.get("Index Name") for c in children if "Index Name" in c), None)
+        relation = plan["Relation Name"]
+        scans.setdefault(parent_table(relation), []).append((plan["Node Type"], index, relation))
+    for child in children:
+        _pg_scans(child, scans)
+    return scans
+
+
+def _check_postgresql(sql, expected, date_bounded):
+    db.session.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = db.session.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = _pg_scans(plan[0]["Plan"])
+
+    problems = []
+    for table, index in expected.items():
+        used = scans.get(table, [])
+        relations = {relation for _, _, relation in used}
+        partitioned = relations != {table}
+        if any(node == "Seq Scan" for node, _, _ in used):
+            problems.append(f"{table}: Seq Scan")
+        elif index and not partitioned and index not in [name for _, name, _ in used]:
+            problems.append(f"{table}: {index} not used ({used})")
+        if partitioned and date_bounded and len(relations) > MAX_PARTITIONS:
+            problems.append(f"{table}: not pruned ({len(relations)} partitions)")
+    return problems, json.dumps(plan, indent=2)
+
+
+def _check_sqlite(sql, expected, date_bounded):
+    rows = db.session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    details = [row[-1] for row in rows]
+    problems = [
+        f"{table}: full scan" for table in expected
+        if any(d.startswith(f"SCAN {table}") and "INDEX" not in d for d in details)
+    ]
+    return problems, "\n".join(details)
+
+
+def check_hot_queries():
+    """[(name, problems, plan text)] for every entry of HOT_QUERIES"""
+    dialect = db.session.get_bind().dialect
+    checker = _check_postgresql if dialect.name == "postgresql" else _check_sqlite
+    results = []
+    for name, build, expected in HOT_QUERIES:
+        sql = str(build().compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        try:
+            problems, plan = checker(sql, expected, name in DATE_BOUNDED)
+        finally:
+            db.session.rollback()
+        results.append((name, problems, plan))
+    return results
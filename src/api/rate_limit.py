@@ -0,0 +1,220 @@
+"""
+Token-bucket rate limiting for the auth endpoints.
+
+A view decorated with @rate_limited("login") is checked against one bucket
+per client IP and, when RATE_LIMIT_LOGIN_EMAIL is set, one per email (taken
+from the JSON body) before the view runs, so a rejected request costs a
+dict lookup instead of a password hash, a DB query or a Loops call. The
+buckets are checked together and a token is only taken when all of them
+have one: a request turned away by the email bucket doesn't cost its IP a
+token. Each endpoint family has its own rule, so a burst of logins doesn't
+block a password reset. With failures_only=True the email bucket is only
+checked before the view; the view spends it with rate_limit_failure() (a
+wrong password), so a user who logs in fine never runs out.
+
+    RATE_LIMIT_ENABLED=1
+    RATE_LIMIT_LOGIN_IP=20/60                20 requests per 60 s per IP (burst 20)
+    RATE_LIMIT_LOGIN_EMAIL=5/300             5 failed logins per 5 min per email
+    RATE_LIMIT_REGISTER_IP=10/3600
+    RATE_LIMIT_REGISTER_EMAIL=3/3600
+    RATE_LIMIT_FORGOT_PASSWORD_IP=10/600
+    RATE_LIMIT_FORGOT_PASSWORD_EMAIL=3/900   reset emails per address
+    RATE_LIMIT_VERIFY_EMAIL_IP=20/60
+    RATE_LIMIT_ACCOUNT_IP=5/300              DELETE /api/me
+    RATE_LIMIT_TRUST_PROXY=0       1 behind Render's/Heroku's proxy (render.yaml):
+                                   client IP = last X-Forwarded-For hop, the one
+                                   the proxy added. Off, X-Forwarded-For is
+                                   ignored, since a direct client can set it
+    RATE_LIMIT_STORAGE_URL=        redis://... to share buckets (RedisBackend)
+
+The default backend is per worker process. Anything with the same take()
+method (a list of buckets, all or nothing) can be passed as create_app({"RATE_LIMIT_BACKEND": backend}); a
+RedisBackend is provided for sharing buckets across workers/instances, and
+one MemoryBackend passed to several apps stands in for it in tests.
+"""
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+
+# KEYS buckets; ARGV now, then capacity, refill per second, cost per bucket.
+# Returns {allowed, retry_after_ms, index of the empty bucket (1-based) or 0}
+REDIS_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+for i = 1, #KEYS do
+  local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local tokens = tonumber(bucket[1]) or capacity
+  local ts = tonumber(bucket[2]) or now
+  tokens = math.min(capacity, tokens + (now - ts) * rate)
+  if tokens < 1 then
+    return {0, math.ceil((1 - tokens) / rate * 1000), i}
+  end
+  levels[i] = tokens
+end
+for i = 1, #KEYS do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  redis.call('HSET', KEYS[i], 'tokens', levels[i] - cost, 'ts', now)
+  redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000))
+end
+return {1, 0, 0}
+"""
+
+
+class MemoryBackend:
+    """Buckets in a dict; shared by all threads of one process"""
+
+    def __init__(self, max_keys=100000):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.max_keys = max_keys
+
+    def take(self, buckets):
+        """
+        buckets: [(key, capacity, rate, cost)]. Takes `cost` tokens from each
+        only if every bucket has one. Returns (allowed, seconds until a token
+        is available, index of the empty bucket or None)
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for i, (key, capacity, rate, _cost) in enumerate(buckets):
+                tokens, ts = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - ts) * rate)
+                if tokens < 1:
+                    return False, (1 - tokens) / rate, i
+                levels.append(tokens)
+            for (key, _capacity, _rate, cost), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_keys:
+                self._evict_idle(now)
+        return True, 0.0, None
+
+    def _evict_idle(self, now):
+        # Buckets idle for an hour are full again, forgetting them changes nothing
+        self._buckets = {
+            k: (tokens, ts) for k, (tokens, ts) in self._buckets.items()
+            if now - ts < 3600
+        }
+
+
+class RedisBackend:
+    """Buckets shared through Redis (pip install redis)"""
+
+    def __init__(self, client, prefix="rl:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(REDIS_TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def take(self, buckets):
+        args = [time.time()]
+        for _key, capacity, rate, cost in buckets:
+            args += [capacity, rate, cost]
+        allowed, retry_ms, index = self._script(
+            keys=[self.prefix + key for key, *_ in buckets], args=args)
+        return bool(allowed), retry_ms / 1000, (index - 1 if index else None)
+
+
+def parse_rule(rule):
+    """'20/60' -> (capacity 20, refill 20/60 tokens per second)"""
+    count, seconds = rule.split("/")
+    count = int(count)
+    return count, count / float(seconds)
+
+
+def client_ip():
+    if current_app.config["RATE_LIMIT_TRUST_PROXY"]:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.remote_addr or "unknown"
+
+
+class RateLimiter:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.rejections = {}
+
+    def check(self, rule_name, failures_only=False):
+        """None if allowed, else seconds to wait"""
+        prefix = f"RATE_LIMIT_{rule_name.upper()}"
+        checks = [("ip", client_ip(), current_app.config[f"{prefix}_IP"], 1)]
+        email_bucket = self._email_bucket(rule_name)
+        if email_bucket:
+            # failures_only: checked, but spent by rate_limit_failure()
+            checks.append(("email", *email_bucket, 0 if failures_only else 1))
+        return self._take(rule_name, checks)
+
+    def failure(self, rule_name):
+        """Spend a token of the email bucket (e.g. a wrong password)"""
+        email_bucket = self._email_bucket(rule_name)
+        if email_bucket:
+            self._take(rule_name, [("email", *email_bucket, 1)], count=False)
+
+    def _email_bucket(self, rule_name):
+        rule = current_app.config.get(f"RATE_LIMIT_{rule_name.upper()}_EMAIL")
+        body = request.get_json(silent=True) or {}
+        email = (body.get("email") or "").strip().lower() if isinstance(body, dict) else ""
+        return (email, rule) if rule and email else None
+
+    def _take(self, rule_name, checks, count=True):
+        buckets = [
+            (f"{rule_name}:{kind}:{value}", *parse_rule(rule), cost)
+            for kind, value, rule, cost in checks
+        ]
+        allowed, retry_after, index = self.backend.take(buckets)
+        if allowed:
+            return None
+        if count:
+            key = (rule_name, checks[index][0])
+            with self._lock:
+                self.rejections[key] = self.rejections.get(key, 0) + 1
+        return retry_after
+
+    def families(self):
+        with self._lock:
+            rejections = sorted(self.rejections.items())
+        samples = [({"rule": r, "key": k}, n) for (r, k), n in rejections]
+        return [("rate_limit_rejections", "counter", "Requests answered 429", samples)]
+
+
+def init_rate_limit(app):
+    backend = app.config.get("RATE_LIMIT_BACKEND")
+    if backend is None:
+        url = app.config.get("RATE_LIMIT_STORAGE_URL")
+        backend = RedisBackend.from_url(url) if url else MemoryBackend()
+    app.extensions["rate_limiter"] = RateLimiter(backend)
+
+
+def rate_limit_failure(rule_name):
+    """Count a failed attempt against the request's email (failures_only rules)"""
+    if current_app.config["RATE_LIMIT_ENABLED"]:
+        current_app.extensions["rate_limiter"].failure(rule_name)
+
+
+def rate_limited(rule_name, failures_only=False):
+    """Answer 429 before the view runs when the IP or email bucket is empty"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_app.config["RATE_LIMIT_ENABLED"]:
+                retry_after = current_app.extensions["rate_limiter"].check(rule_name, failures_only)
+                if retry_after is not None:
+                    response = jsonify({"msg": "Demasiados intentos, inténtalo más tarde"})
+                    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+                    return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
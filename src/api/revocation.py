@@ -0,0 +1,169 @@
+"""
+Access token revocation.
+
+Every token carries the user's token_version in a "ver" claim (issue_token).
+revoke_user_tokens() bumps users.token_version, so every token issued
+before it stops working: change_password uses it, and a password reset
+link can't be used twice.
+
+Checking the version on each @jwt_required request must not cost a query.
+Each worker keeps a RevocationList, {user_id: token_version} of the users
+revoked within MAX_TOKEN_DAYS (older tokens have expired anyway), refreshed
+every JWT_REVOCATION_REFRESH_SECONDS with an indexed query on
+users.tokens_revoked_at for what changed since the last refresh. A
+revocation made by this worker applies at once; other workers see it
+within that interval.
+
+    JWT_REVOCATION_REFRESH_SECONDS=30
+
+A token issued with a scope (issue_token(..., scope="mirror_stream")) is
+only accepted by the api.<scope> endpoint: short-lived tokens that travel in
+a URL, and end up in access logs, open nothing else.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from flask import current_app, jsonify, request
+from flask_jwt_extended import create_access_token
+from api.db_routing import RoutingSession
+from api.models import db, User
+
+# Longest expires_delta a token is issued with (login with remember_me)
+MAX_TOKEN_DAYS = 30
+# Revocations committed by other workers while we refresh
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def issue_token(user, expires_delta, scope=None):
+    claims = {"ver": user.token_version or 0}
+    if scope:
+        claims["scope"] = scope
+    return create_access_token(
+        identity=str(user.id),
+        expires_delta=expires_delta,
+        additional_claims=claims,
+    )
+
+
+class RevocationList:
+    """user_id -> current token_version for recently revoked users"""
+
+    def __init__(self, engine_getter, refresh_seconds):
+        self._engine_getter = engine_getter
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # user_id -> (token_version, tokens_revoked_at)
+        self._entries = {}
+        self._since = None
+        self._refreshed_at = None
+        self.rejections = 0
+        self.refreshes = 0
+
+    def is_revoked(self, user_id, version):
+        self._maybe_refresh()
+        entry = self._entries.get(user_id)
+        return entry is not None and version < entry[0]
+
+    def note(self, user_id, version, revoked_at):
+        """Apply a revocation made by this process without waiting for a refresh"""
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is None or current[0] < version:
+                self._entries[user_id] = (version, revoked_at)
+
+    def _maybe_refresh(self):
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        # The first load blocks; later ones are done by one thread while the
+        # others keep using the current entries
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+                self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def refresh(self):
+        horizon = datetime.utcnow() - timedelta(days=MAX_TOKEN_DAYS)
+        since = horizon if self._since is None else max(horizon, self._since - REFRESH_OVERLAP)
+        # Straight to the primary: a lagging replica would miss fresh revocations
+        with self._engine_getter().connect() as conn:
+            rows = conn.execute(
+                db.select(User.id, User.token_version, User.tokens_revoked_at)
+                .where(User.tokens_revoked_at >= since)
+            ).all()
+        with self._lock:
+            for user_id, version, revoked_at in rows:
+                current = self._entries.get(user_id)
+                if current is None or current[0] < version:
+                    self._entries[user_id] = (version, revoked_at)
+                if self._since is None or revoked_at > self._since:
+                    self._since = revoked_at
+            if self._since is None:
+                self._since = horizon
+            # Tokens from before these revocations have expired
+            self._entries = {k: v for k, v in self._entries.items() if v[1] >= horizon}
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def families(self):
+        return [
+            ("jwt_revocation_entries", "gauge", "Users in the revocation list", [({}, len(self._entries))]),
+            ("jwt_revoked_rejections", "counter", "Requests answered 401 for a revoked token", [({}, self.rejections)]),
+            ("jwt_revocation_refreshes", "counter", "Revocation list refreshes", [({}, self.refreshes)]),
+        ]
+
+
+def revoke_user_tokens(user):
+    """Invalidate every token issued to the user so far; the caller commits"""
+    user.token_version = (user.token_version or 0) + 1
+    user.tokens_revoked_at = datetime.utcnow()
+    db.session.info.setdefault("revoked_users", []).append(
+        (user.id, user.token_version, user.tokens_revoked_at))
+
+
+@sa.event.listens_for(RoutingSession, "after_commit")
+def _remember_revocations(session):
+    # After commit, so a rolled back change doesn't revoke anything
+    revoked = session.info.pop("revoked_users", None)
+    if revoked and "jwt_revocations" in current_app.extensions:
+        revocations = current_app.extensions["jwt_revocations"]
+        for user_id, version, revoked_at in revoked:
+            revocations.note(user_id, version, revoked_at)
+
+
+@sa.event.listens_for(RoutingSession, "after_rollback")
+def _forget_revocations(session):
+    session.info.pop("revoked_users", None)
+
+
+def init_revocation(app, jwt):
+    revocations = RevocationList(lambda: db.engine, app.config["JWT_REVOCATION_REFRESH_SECONDS"])
+    app.extensions["jwt_revocations"] = revocations
+
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_payload):
+        try:
+            user_id = int(jwt_payload["sub"])
+        except (KeyError, ValueError):
+            return False
+        revoked = revocations.is_revoked(user_id, jwt_payload.get("ver", 0))
+        if revoked:
+            revocations.rejections += 1
+        return revoked
+
+    @jwt.revoked_token_loader
+    def revoked_response(jwt_header, jwt_payload):
+        return jsonify({"msg": "Sesión expirada, vuelve a iniciar sesión"}), 401
+
+    @jwt.token_verification_loader
+    def token_scope_allowed(jwt_header, jwt_payload):
+        scope = jwt_payload.get("scope")
+        return scope is None or request.endpoint == f"api.{scope}"
+
+    @jwt.token_verification_failed_loader
+    def scope_refused_response(jwt_header, jwt_payload):
+        return jsonify({"msg": "Token no válido para esta ruta"}), 401
@@ -1,5 +1,5 @@
 import os
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, Response, current_app, redirect, stream_with_context
 from api.models import (
     db,
     User,
@@ -13,11 +13,21 @@ from api.models import (
     ActivityType,
 )
 from flask_cors import CORS
+from sqlalchemy.orm import contains_eager
 from datetime import datetime, timedelta, timezone
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from api.service_loops.welcome_user import send_welcome_transactional , LoopsError
-from api.service_loops.reset_password import send_password_reset
-from api.service_loops.verify_email import send_verify_email , LoopsError
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from api.db_routing import replica_reads
+from api.serializers import active_activities, all_emotions
+from api.compression import cache_compressed
+from api.rate_limit import rate_limited, rate_limit_failure
+from api.idempotency import idempotent
+from api.archive import export_history
+from api.purge import purge_users
+from api.points import points_state
+from api.events import STREAM_TOKEN_SECONDS, notify, stream
+from api.mirror_cache import invalidate_mirror, mirror_cached
+from api.revocation import MAX_TOKEN_DAYS, issue_token, revoke_user_tokens
+from api.email_verification import VerificationError, make_token, result_url, verify_token, verify_url
 import os
 from werkzeug.security import generate_password_hash
 
@@ -42,6 +52,8 @@ def handle_hello():
 # -------------------------
 
 @api.route("/register", methods=["POST"])
+@rate_limited("register")
+@idempotent
 def register():
     body = request.get_json(silent=True) or {}
 
@@ -70,6 +82,10 @@ def register():
     db.session.add(user)
     db.session.commit()
 
+    # Email senders pull in `requests`; import them on first use, not at boot
+    from api.service_loops.welcome_user import send_welcome_transactional, LoopsError
+    from api.service_loops.verify_email import send_verify_email
+
     try:
         transactional_id = os.getenv("LOOPS_WELCOME_TRANSACTIONAL_ID")
         if not transactional_id:
@@ -83,6 +99,9 @@ def register():
             transactional_id=transactional_id,
             data=user.username.capitalize()
         )
+        # Outbox health on the admin dashboard counts the ones still empty
+        user.welcome_email_sent_at = datetime.utcnow()
+        db.session.commit()
 
     except Exception as e:
         print("Error Loops (debug):", repr(e))
@@ -92,18 +111,11 @@ def register():
         if not verify_id:
             raise LoopsError("Falta LOOPS_VERIFY_EMAIL_TRANSACTIONAL_ID")
 
-        verify_token = create_access_token(
-        identity=str(user.id),
-        expires_delta=timedelta(hours=24)
-        )
-
-        verify_url = "http://localhost:3001/api/verify-email?token=" + verify_token
-
         send_verify_email(
             email=user.email,
             transactional_id=verify_id,
             username=user.username,
-            url_verify=verify_url
+            url_verify=verify_url(make_token(user))
         )
 
     except Exception as e:
@@ -117,6 +129,7 @@ def register():
 
 
 @api.route("/login", methods=["POST"])
+@rate_limited("login", failures_only=True)
 def login():
     body = request.get_json(silent=True) or {}
 
@@ -129,25 +142,41 @@ def login():
 
     user = User.query.filter_by(email=email).first()
     if not user or not user.check_password(password):
+        rate_limit_failure("login")
         return jsonify({"msg": "Credenciales inválidas"}), 401
 
     # Persist last_login_at
     user.last_login_at = datetime.now(timezone.utc)
     db.session.commit()
 
-    expires = timedelta(days=30) if remember_me else timedelta(hours=24)
-    access_token = create_access_token(
-        identity=str(user.id), expires_delta=expires)
+    expires = timedelta(days=MAX_TOKEN_DAYS) if remember_me else timedelta(hours=24)
+    access_token = issue_token(user, expires)
 
     return jsonify({
         "access_token": access_token,
         "user": user.serialize()
     }), 200
 
+@api.route("/verify-email", methods=["GET"])
+@rate_limited("verify_email")
+def verify_email():
+    """
+    ?token=... del enlace enviado al registrarse (api/email_verification.py).
+    Cada enlace sirve una sola vez. Lo abre el navegador: redirige a la
+    página del frontend auth/verify?status=ok|expired|verified|invalid.
+    """
+    try:
+        verify_token(request.args.get("token"))
+    except VerificationError as e:
+        return redirect(result_url(e.status))
+
+    return redirect(result_url("ok"))
+
 #--------------------------
 # PASSWORD RESET
 #--------------------------
 @api.route('/auth/forgot-password', methods=['POST'])
+@rate_limited("forgot_password")
 def reset_password():
     email = request.json.get('email',None)
 
@@ -159,13 +188,11 @@ def reset_password():
     if not user:
         return jsonify({"msg": "Si el email existe, recibirás un enlace para restablecer tu contraseña."}), 404
 
-    token = create_access_token(
-    identity=str(user.id),
-    expires_delta=timedelta(hours=1)
-)
+    token = issue_token(user, timedelta(hours=1))
     
     url_reset = os.getenv('VITE_FRONTEND_URL') + "auth/reset?token=" + token
-    
+
+    from api.service_loops.reset_password import send_password_reset
     send_password_reset(email, url_reset)
 
     return jsonify({"msg": "Si el email existe, recibirás un enlace para restablecer tu contraseña."}), 200
@@ -191,6 +218,8 @@ def change_password():
         return jsonify({"msg" :"Usuario no encontrado"}),400
     
     user.password_hash = generate_password_hash(password)
+    # Old sessions and this reset link stop working
+    revoke_user_tokens(user)
     db.session.add(user)
     db.session.commit()
 
@@ -250,6 +279,9 @@ def create_or_get_session():
             session_type=st_enum
         )
         db.session.add(session)
+        # The week view of today may include session_date
+        user.last_activity_at = datetime.utcnow()
+        invalidate_mirror(user.id, datetime.now(timezone.utc).date())
         db.session.commit()
 
     return jsonify(session.serialize()), 200
@@ -260,6 +292,8 @@ def create_or_get_session():
 # -------------------------
 @api.route("/mirror/today", methods=["GET"])
 @jwt_required()
+@replica_reads
+@mirror_cached("today")
 def mirror_today():
     """
     Optional query:
@@ -304,30 +338,38 @@ def mirror_today():
     activities = []
     points_by_category = {}
 
-    for s in sessions:
-        completions = (
-            ActivityCompletion.query
-            .join(Activity, ActivityCompletion.activity_id == Activity.id)
-            .join(ActivityCategory, Activity.category_id == ActivityCategory.id)
-            .filter(ActivityCompletion.daily_session_id == s.id)
-            .all()
+    # One range scan on (user_id, session_date); activity and category
+    # come from the same query instead of a lazy load per row
+    sessions_by_id = {s.id: s for s in sessions}
+    completions = (
+        ActivityCompletion.query
+        .join(ActivityCompletion.activity)
+        .join(Activity.category)
+        .options(contains_eager(ActivityCompletion.activity).contains_eager(Activity.category))
+        .filter(
+            ActivityCompletion.user_id == user.id,
+            ActivityCompletion.session_date == today,
+            ActivityCompletion.daily_session_id.in_(sessions_by_id),
         )
+        .all()
+    )
 
-        for c in completions:
-            cat_name = c.activity.category.name if c.activity and c.activity.category else "General"
-            pts = int(c.points_awarded or 0)
+    for c in completions:
+        s = sessions_by_id[c.daily_session_id]
+        cat_name = c.activity.category.name if c.activity and c.activity.category else "General"
+        pts = int(c.points_awarded or 0)
 
-            points_by_category[cat_name] = points_by_category.get(cat_name, 0) + pts
+        points_by_category[cat_name] = points_by_category.get(cat_name, 0) + pts
 
-            activities.append({
-                "id": c.activity.id,
-                "external_id": c.activity.external_id,
-                "name": c.activity.name,
-                "category_name": cat_name,
-                "points": pts,
-                "session_type": s.session_type.value,
-                "completed_at": c.completed_at.isoformat() + "Z"
-            })
+        activities.append({
+            "id": c.activity.id,
+            "external_id": c.activity.external_id,
+            "name": c.activity.name,
+            "category_name": cat_name,
+            "points": pts,
+            "session_type": s.session_type.value,
+            "completed_at": c.completed_at.isoformat() + "Z"
+        })
 
 
     # Orden cronológico (para sendero y lista)
@@ -337,8 +379,7 @@ def mirror_today():
     # Latest emotion checkin across sessions
     latest_checkin = (
         EmotionCheckin.query
-        .join(DailySession, EmotionCheckin.daily_session_id == DailySession.id)
-        .filter(DailySession.user_id == user.id, DailySession.session_date == today)
+        .filter(EmotionCheckin.user_id == user.id, EmotionCheckin.session_date == today)
         .order_by(EmotionCheckin.created_at.desc())
         .first()
     )
@@ -363,25 +404,98 @@ def mirror_today():
     }), 200
 
 
+@api.route("/mirror/stream-token", methods=["POST"])
+@jwt_required()
+def mirror_stream_token():
+    """
+    Token de STREAM_TOKEN_SECONDS que solo abre /api/mirror/stream. Va en la
+    URL (?jwt=), que queda en los logs: nunca el token de sesión.
+    404 si el stream está apagado y 503 si el worker ya no admite más
+    conexiones: el front pasa entonces a consultar /api/mirror/today.
+    """
+    config = current_app.config
+    if not config["MIRROR_STREAM_ENABLED"]:
+        return jsonify({"msg": "Not found"}), 404
+    # Aviso previo; el hueco se reserva de verdad en /api/mirror/stream
+    if current_app.extensions["mirror_events"].streams() >= config["MIRROR_STREAM_MAX_CLIENTS"]:
+        response = jsonify({"msg": "Demasiadas conexiones, inténtalo más tarde"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return jsonify({"msg": "Token inválido (identity)"}), 401
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return jsonify({"msg": "Usuario no encontrado"}), 404
+
+    token = issue_token(user, timedelta(seconds=STREAM_TOKEN_SECONDS), scope="mirror_stream")
+    return jsonify({"token": token, "expires_in": STREAM_TOKEN_SECONDS}), 200
+
+
+@api.route("/mirror/stream", methods=["GET"])
+@jwt_required(locations=["query_string"])
+def mirror_stream():
+    """
+    Server-Sent Events con los cambios del Espejo (api/events.py).
+    EventSource no manda cabeceras: el token de POST /api/mirror/stream-token
+    va en ?jwt=...
+    """
+    config = current_app.config
+    if not config["MIRROR_STREAM_ENABLED"]:
+        return jsonify({"msg": "Not found"}), 404
+    if get_jwt().get("scope") != "mirror_stream":
+        return jsonify({"msg": "Token no válido para esta ruta"}), 401
+
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return jsonify({"msg": "Token inválido (identity)"}), 401
+
+    broker = current_app.extensions["mirror_events"]
+    subscription = broker.subscribe(user_id, limit=config["MIRROR_STREAM_MAX_CLIENTS"])
+    if subscription is None:
+        response = jsonify({"msg": "Demasiadas conexiones, inténtalo más tarde"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    body = stream(broker, subscription,
+                  config["MIRROR_STREAM_HEARTBEAT_SECONDS"], config["MIRROR_STREAM_MAX_SECONDS"])
+    response = Response(stream_with_context(body), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # nginx/Render proxies: don't buffer the stream
+        "X-Accel-Buffering": "no",
+    })
+    # Frees the slot even if the body is never read
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
+
+
 # -------------------------
 # READ-ONLY LISTS (safe)
+# Views marked @replica_reads may read from a replica (api/db_routing.py)
 # -------------------------
 @api.route("/emotions", methods=["GET"])
 #@jwt_required()
+@replica_reads
+@cache_compressed
 def get_all_emotions():
-    emotions = Emotion.query.all()
-    return jsonify([e.serialize() for e in emotions]), 200
+    return jsonify(all_emotions()), 200
 
 
 @api.route("/activities", methods=["GET"])
 #@jwt_required()
+@replica_reads
+@cache_compressed
 def get_all_activities():
-    activities = Activity.query.filter_by(is_active=True).all()
-    return jsonify([a.serialize() for a in activities]), 200
+    return jsonify(active_activities()), 200
 
 
 @api.route("/activities/complete", methods=["POST"])
 @jwt_required()
+@idempotent
 def complete_activity():
     body = request.get_json(silent=True) or {}
 
@@ -431,6 +545,7 @@ def complete_activity():
     # Idempotencia
     existing = ActivityCompletion.query.filter_by(
         daily_session_id=session.id,
+        session_date=session.session_date,
         activity_id=activity.id
     ).first()
 
@@ -453,6 +568,8 @@ def complete_activity():
 
     completion = ActivityCompletion(
         daily_session_id=session.id,
+        user_id=user.id,
+        session_date=session.session_date,
         activity_id=activity.id,
         points_awarded=points
     )
@@ -460,6 +577,22 @@ def complete_activity():
     session.points_earned += points
 
     db.session.add(completion)
+    db.session.flush()
+    notify(user.id, "completion", {
+        "date": today.isoformat(),
+        "activity": {
+            "id": activity.id,
+            "external_id": activity.external_id,
+            "name": activity.name,
+            "category_name": activity.category.name if activity.category else "General",
+            "points": points,
+            "session_type": session.session_type.value,
+            "completed_at": completion.completed_at.isoformat() + "Z",
+        },
+    })
+    notify(user.id, "points", {"date": today.isoformat(), "session": session.serialize()})
+    user.last_activity_at = datetime.utcnow()
+    invalidate_mirror(user.id, today)
     db.session.commit()
 
     return jsonify({
@@ -470,23 +603,47 @@ def complete_activity():
     }), 201
 
 
+@api.route("/points/today", methods=["GET"])
+@jwt_required()
+@replica_reads
+def points_today():
+    """
+    Ledger de puntos de hoy (api/points.py): { date, version, total, full, ledger }
+    Con ?since=<version> devuelve solo lo nuevo en "changes" (full: false).
+    """
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return jsonify({"msg": "Token inválido (identity)"}), 401
+    today = datetime.now(timezone.utc).date()
+    return jsonify(points_state(user_id, today, request.args.get("since"))), 200
+
+
 @api.route("/mirror/week", methods=["GET"])
 @jwt_required()
+@replica_reads
+@mirror_cached("week")
 def mirror_week():
-    user_id = int(get_jwt_identity())
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return jsonify({"msg": "Token inválido (identity)"}), 401
     today = datetime.now(timezone.utc).date()
 
     start = today - timedelta(days=6)
 
-    sessions = (
-        DailySession.query
-        .filter(
+    # Only the columns of ix_daily_sessions_user_date_points (index-only scan)
+    sessions = db.session.execute(
+        db.select(
+            DailySession.session_date,
+            DailySession.session_type,
+            DailySession.points_earned,
+        ).where(
             DailySession.user_id == user_id,
             DailySession.session_date >= start,
             DailySession.session_date <= today
         )
-        .all()
-    )
+    ).all()
 
     days = {}
     for i in range(7):
@@ -509,12 +666,52 @@ def mirror_week():
     return jsonify(list(days.values())), 200
 
 
+@api.route("/me", methods=["DELETE"])
+@jwt_required()
+@rate_limited("account")
+def delete_my_account():
+    """
+    Body: { "password": "..." }
+    Borra la cuenta y todos sus datos (api/purge.py).
+    """
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return jsonify({"msg": "Token inválido (identity)"}), 401
+
+    body = request.get_json(silent=True) or {}
+    user = db.session.get(User, user_id)
+    if not user:
+        return jsonify({"msg": "Usuario no encontrado"}), 404
+    if not user.check_password(body.get("password") or ""):
+        return jsonify({"msg": "Contraseña incorrecta"}), 401
+
+    purge_users([user.id])
+    return jsonify({"msg": "Cuenta eliminada"}), 200
+
+
+@api.route("/history/export", methods=["GET"])
+@jwt_required()
+@replica_reads
+def export_my_history():
+    """Todo el historial del usuario, incluido el archivado (api/archive.py)"""
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return jsonify({"msg": "Token inválido (identity)"}), 401
+
+    if not db.session.get(User, user_id):
+        return jsonify({"msg": "Usuario no encontrado"}), 404
+    return jsonify(export_history(user_id)), 200
+
+
 # -------------------------
 # SEED-ACTIVITIES
 # -------------------------
 
 @api.route("/emotions/checkin", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_emotion_checkin():
     """
     Body:
@@ -577,12 +774,27 @@ def create_emotion_checkin():
 
     checkin = EmotionCheckin(
         daily_session_id=session.id,
+        user_id=user.id,
+        session_date=session.session_date,
         emotion_id=emotion.id,
         intensity=intensity,
         note=note_text if note_text else None
     )
 
     db.session.add(checkin)
+    db.session.flush()
+    notify(user.id, "checkin", {
+        "date": today.isoformat(),
+        "emotion": {
+            "name": emotion.name,
+            "value": emotion.value,
+            "intensity": checkin.intensity,
+            "note": checkin.note,
+            "created_at": checkin.created_at.isoformat() + "Z",
+        },
+    })
+    user.last_activity_at = datetime.utcnow()
+    invalidate_mirror(user.id, today)
     db.session.commit()
 
     return jsonify({
@@ -619,6 +831,7 @@ def dev_seed_activities_bulk():
     created = 0
     updated = 0
     skipped = 0
+    updated_ids = []
 
     for a in items:
         ext = (a.get("id") or "").strip()
@@ -659,6 +872,23 @@ def dev_seed_activities_bulk():
             activity.activity_type = at_enum
             activity.is_active = True
             updated += 1
+            updated_ids.append(activity.id)
+
+    # /api/mirror/today lists today's completions with the activity's name
+    # and category: drop the cached bodies of the users who did these
+    if updated_ids:
+        today = datetime.now(timezone.utc).date()
+        user_ids = db.session.execute(
+            db.select(ActivityCompletion.user_id).distinct().where(
+                ActivityCompletion.activity_id.in_(updated_ids),
+                ActivityCompletion.session_date == today)
+        ).scalars().all()
+        if user_ids:
+            # Other workers' entries go stale with last_activity_at
+            db.session.execute(
+                db.update(User).where(User.id.in_(user_ids)).values(last_activity_at=datetime.utcnow()))
+            for user_id in user_ids:
+                invalidate_mirror(user_id, today)
 
     db.session.commit()
 
@@ -694,6 +924,10 @@ def dev_reset_today():
         DailySession.query.filter(DailySession.id.in_(
             session_ids)).delete(synchronize_session=False)
 
+    notify(user_id, "reset", {"date": today.isoformat()})
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(last_activity_at=datetime.utcnow()))
+    invalidate_mirror(user_id, today)
     db.session.commit()
 
     return jsonify({"msg": "Reset de hoy completado"}), 200
@@ -0,0 +1,42 @@
+"""
+Column-based serializers for read-only lists.
+
+Selecting just the columns returns plain rows instead of ORM objects (no
+identity map, no attribute instrumentation), and the JSON provider encodes
+enums/datetimes itself. Output matches the models' serialize().
+"""
+from api.models import db, Activity, Emotion
+
+ACTIVITY_COLUMNS = (
+    Activity.id,
+    Activity.external_id,
+    Activity.category_id,
+    Activity.name,
+    Activity.description,
+    Activity.activity_type,
+    Activity.is_active,
+)
+
+EMOTION_COLUMNS = (
+    Emotion.id,
+    Emotion.name,
+    Emotion.description,
+    Emotion.value,
+    Emotion.url_music,
+)
+
+
+def column_rows(columns, *where, order_by=None):
+    """[{column name: value}] for a SELECT of `columns`"""
+    stmt = db.select(*columns).where(*where)
+    if order_by is not None:
+        stmt = stmt.order_by(order_by)
+    return [dict(row) for row in db.session.execute(stmt).mappings()]
+
+
+def active_activities():
+    return column_rows(ACTIVITY_COLUMNS, Activity.is_active.is_(True), order_by=Activity.id)
+
+
+def all_emotions():
+    return column_rows(EMOTION_COLUMNS, order_by=Emotion.id)
@@ -1,5 +1,6 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
 
 LOOPS_BASE_URL = "https://app.loops.so/api/v1"
 
@@ -15,7 +16,15 @@ def _headers():
         "Content-Type": "application/json"
     }
 
-def send_verify_email(email: str, transactional_id: str, username: str, url_verify: str) -> None:
+def pooled_session(pool_size: int = 10) -> requests.Session:
+    """One keep-alive connection pool for many sends (bulk resend)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+def send_verify_email(email: str, transactional_id: str, username: str, url_verify: str,
+                      session: requests.Session | None = None) -> None:
     payload = {
         "transactionalId": transactional_id,
         "email": email,
@@ -25,7 +34,7 @@ def send_verify_email(email: str, transactional_id: str, username: str, url_veri
         }
     }
 
-    r = requests.post(
+    r = (session or requests).post(
         f"{LOOPS_BASE_URL}/transactional",
         headers=_headers(),
         json=payload,
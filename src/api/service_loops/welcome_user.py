@@ -1,9 +1,7 @@
 import os
 import requests
 
-LOOPS_API_KEY = os.getenv("LOOPS_API_KEY")
 LOOPS_BASE_URL = "https://app.loops.so/api/v1"
-url_Frontend = os.getenv('VITE_FRONTEND_URL') + "auth/login"
 
 
 class LoopsError(Exception):
@@ -11,21 +9,31 @@ class LoopsError(Exception):
 
 
 def _headers():
-    if not LOOPS_API_KEY:
+    # Env is read per call (not at import) so the module can be imported
+    # without a complete .env
+    api_key = os.getenv("LOOPS_API_KEY")
+    if not api_key:
         raise LoopsError("Falta LOOPS_API_KEY en el .env")
     return {
-        "Authorization": f"Bearer {LOOPS_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
 
 
+def _login_url():
+    frontend_url = os.getenv("VITE_FRONTEND_URL")
+    if not frontend_url:
+        raise LoopsError("Falta VITE_FRONTEND_URL en el .env")
+    return frontend_url + "auth/login"
+
+
 def send_welcome_transactional(email: str, transactional_id: str, data: str | None = None) -> None:
     payload = {
         "transactionalId": transactional_id,
         "email": email,
         "dataVariables": {
             "first_name": data,
-            "url_login": url_Frontend 
+            "url_login": _login_url()
         }
     }
 
@@ -0,0 +1,165 @@
+"""
+Static SPA serving from dist/.
+
+The directory is scanned once at startup into a manifest, so a request never
+needs a filesystem check to decide between a real file and the SPA fallback.
+Vite's hashed files under assets/ are cached forever, index.html is always
+revalidated, and .br/.gz siblings (see `flask precompress-static`) are sent
+when the client accepts them.
+
+Which files are hashed comes from Vite's build manifest (build.manifest in
+vite.config.js, dist/.vite/manifest.json). Without one, a file name ending
+in Vite's 8 character hash (FINGERPRINT_RE) counts as hashed.
+"""
+import os
+import re
+import gzip
+import json
+import mimetypes
+from flask import current_app, request, send_from_directory
+
+# Vite output: assets/index-4f3a2b1c.js, assets/logo-Bx1Xk3_a.svg. Exactly 8
+# characters right before the extension, so assets/hero-background.png isn't
+FINGERPRINT_RE = re.compile(r"^assets/[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+# Where Vite 5 (and Vite 4) write the build manifest
+VITE_MANIFESTS = (".vite/manifest.json", "manifest.json")
+
+# Encodings in order of preference, with the suffix of the pre-built file
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".js", ".mjs", ".css", ".html", ".json", ".svg", ".txt", ".map", ".ico", ".xml"
+)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class StaticManifest:
+    """Snapshot of the files under `root`: {relative path: available encodings}"""
+
+    def __init__(self, root):
+        self.root = root
+        self.files = {}
+        # Hashed files listed in Vite's manifest; None when there is none
+        self.hashed = None
+        self.scan()
+
+    def scan(self):
+        files = {}
+        for dirpath, _dirs, filenames in os.walk(self.root):
+            names = set(filenames)
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            prefix = "" if rel_dir == "." else rel_dir + "/"
+            for filename in filenames:
+                # foo.js.gz is a variant of foo.js, not a file of its own
+                if filename.endswith((".br", ".gz")) and filename[:-3] in names:
+                    continue
+                files[prefix + filename] = tuple(
+                    encoding for encoding, suffix in ENCODINGS
+                    if filename + suffix in names
+                )
+        self.hashed = self._read_vite_manifest(files)
+        # Build metadata (source paths), not something to serve
+        for name in VITE_MANIFESTS:
+            files.pop(name, None)
+        self.files = files
+        return self
+
+    def _read_vite_manifest(self, files):
+        for name in VITE_MANIFESTS:
+            if name not in files:
+                continue
+            try:
+                with open(os.path.join(self.root, name), encoding="utf-8") as f:
+                    chunks = json.load(f)
+            except (OSError, ValueError):
+                continue
+            hashed = set()
+            for chunk in chunks.values():
+                if chunk.get("file"):
+                    hashed.add(chunk["file"])
+                hashed.update(chunk.get("css", ()))
+                hashed.update(chunk.get("assets", ()))
+            return hashed
+        return None
+
+    def is_fingerprinted(self, path):
+        if self.hashed is not None:
+            return path in self.hashed
+        return bool(FINGERPRINT_RE.match(path))
+
+    def __contains__(self, path):
+        return path in self.files
+
+    def encodings(self, path):
+        return self.files.get(path, ())
+
+
+def _pick_encoding(available):
+    for encoding, suffix in ENCODINGS:
+        if encoding in available and request.accept_encodings.quality(encoding) > 0:
+            return encoding, suffix
+    return None, ""
+
+
+def send_static(manifest, path):
+    """Serve `path` from the manifest, falling back to index.html for SPA routes"""
+    if path not in manifest:
+        path = "index.html"
+
+    available = manifest.encodings(path)
+    encoding, suffix = _pick_encoding(available)
+
+    # index.html goes out with max_age=None, which send_file turns into no-cache
+    fingerprinted = manifest.is_fingerprinted(path)
+    if fingerprinted:
+        max_age = IMMUTABLE_MAX_AGE
+    elif path == "index.html":
+        max_age = None
+    else:
+        max_age = current_app.config["STATIC_MAX_AGE"]
+
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    response = send_from_directory(
+        manifest.root, path + suffix, mimetype=mimetype, max_age=max_age)
+
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if available:
+        response.vary.add("Accept-Encoding")
+    if fingerprinted:
+        response.cache_control.immutable = True
+    return response
+
+
+def precompress(root, min_size=1024, level=9):
+    """
+    Write .gz (and .br when the brotli package is installed) next to every
+    compressible file under `root`. Returns the number of files written.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    written = 0
+    for dirpath, _dirs, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            full = os.path.join(dirpath, filename)
+            with open(full, "rb") as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+
+            with open(full + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=level, mtime=0))
+            written += 1
+
+            if brotli is not None:
+                with open(full + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+                written += 1
+    return written
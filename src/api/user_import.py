@@ -0,0 +1,142 @@
+"""
+Bulk user import from CSV (`flask import-users users.csv`).
+
+Columns: email, username, and optionally password, timezone,
+is_email_verified. Rows without a password get an unusable hash; those
+users set one with forgot-password.
+
+The file is streamed in batches of `batch_size` rows. Emails and usernames
+already in the database are loaded once into sets, so validation and
+deduplication (against the table and earlier rows of the file) are set
+lookups. Password hashing is the slow part: it runs in a process pool, and
+while one batch is being hashed the previous one is inserted with a Core
+executemany and committed, so an interrupted import keeps what it wrote
+and a rerun skips it as duplicates. No emails are sent; the users are
+marked welcome_email_skipped so the dashboard outbox doesn't wait for them.
+"""
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from zoneinfo import available_timezones
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+from api.models import db, User
+
+# check_password_hash() is False for anything without a method/salt
+UNUSABLE_PASSWORD = "!"
+TRUE_VALUES = {"1", "true", "yes", "si", "sí"}
+# Passwords per task sent to a pool process
+HASH_CHUNK = 16
+
+
+def _hash(password):
+    return generate_password_hash(password) if password else UNUSABLE_PASSWORD
+
+
+class Importer:
+
+    def __init__(self, conn, dry_run=False):
+        self.conn = conn
+        self.dry_run = dry_run
+        self.emails = set(conn.execute(sa.select(sa.func.lower(User.email))).scalars())
+        self.usernames = set(conn.execute(sa.select(User.username)).scalars())
+        self.timezones = available_timezones()
+        self.counts = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+        self.rejects = []
+
+    def validate(self, line, row):
+        """(user row, password) or None; rejected rows go to self.rejects"""
+        email = (row.get("email") or "").strip().lower()
+        username = (row.get("username") or "").strip()
+        tz = (row.get("timezone") or "").strip() or "UTC"
+
+        reason = None
+        if not email or not username:
+            reason = "email y username son obligatorios"
+        elif "@" not in email or len(email) > 120 or len(username) > 80:
+            reason = "email o username no válido"
+        elif tz not in self.timezones:
+            reason = "timezone no válida"
+        elif email in self.emails:
+            reason = "email ya registrado"
+        elif username in self.usernames:
+            reason = "username ya registrado"
+        if reason:
+            key = "duplicates" if reason.endswith("registrado") else "invalid"
+            self.counts[key] += 1
+            self.rejects.append((line, email, reason))
+            return None
+
+        self.emails.add(email)
+        self.usernames.add(username)
+        verified = (row.get("is_email_verified") or "").strip().lower() in TRUE_VALUES
+        now = datetime.utcnow()
+        return {
+            "email": email,
+            "username": username,
+            "timezone": tz,
+            "is_email_verified": verified,
+            "email_verified_at": now if verified else None,
+            "created_at": now,
+            "welcome_email_skipped": True,
+        }, row.get("password") or ""
+
+    def insert(self, users, hashes):
+        if not users or self.dry_run:
+            self.counts["imported"] += len(users)
+            return
+        rows = [dict(user, password_hash=h) for user, h in zip(users, hashes)]
+        try:
+            self.conn.execute(sa.insert(User), rows)
+            self.conn.commit()
+            self.counts["imported"] += len(rows)
+        except sa.exc.IntegrityError:
+            # Someone registered one of these meanwhile: insert one by one
+            self.conn.rollback()
+            for row in rows:
+                try:
+                    self.conn.execute(sa.insert(User), row)
+                    self.conn.commit()
+                    self.counts["imported"] += 1
+                except sa.exc.IntegrityError:
+                    self.conn.rollback()
+                    self.counts["duplicates"] += 1
+                    self.rejects.append((None, row["email"], "email o username ya registrado"))
+
+    def run(self, lines, batch_size=1000, workers=None, progress=None):
+        reader = csv.DictReader(lines)
+        started = time.perf_counter()
+        pending = None
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                users, passwords = [], []
+                for row in reader:
+                    self.counts["read"] += 1
+                    valid = self.validate(reader.line_num, row)
+                    if valid:
+                        users.append(valid[0])
+                        passwords.append(valid[1])
+                    if len(users) >= batch_size:
+                        break
+                # Submit this batch's hashes, then insert the previous batch
+                hashes = [] if self.dry_run else pool.map(_hash, passwords, chunksize=HASH_CHUNK)
+                current = (users, hashes)
+                if pending:
+                    self.insert(pending[0], list(pending[1]))
+                    if progress:
+                        elapsed = time.perf_counter() - started
+                        progress(dict(self.counts, per_second=round(self.counts["read"] / elapsed) if elapsed else 0))
+                pending = current
+                if not users:
+                    break
+        self.counts["seconds"] = round(time.perf_counter() - started, 1)
+        return self.counts
+
+
+def import_users(path, batch_size=1000, workers=None, dry_run=False, progress=None):
+    """Import a CSV file; returns (counts, rejected [(line, email, reason)])"""
+    with db.engine.connect() as conn, open(path, newline="", encoding="utf-8-sig") as f:
+        importer = Importer(conn, dry_run=dry_run)
+        counts = importer.run(f, batch_size=batch_size, workers=workers, progress=progress)
+        return counts, importer.rejects
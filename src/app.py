@@ -2,82 +2,215 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, send_from_directory
+from flask import Flask, jsonify, current_app
 from flask_migrate import Migrate
-from flask_swagger import swagger
 from api.utils import APIException, generate_sitemap
 from api.models import db
 from api.routes import api
-from api.admin import setup_admin
 from api.commands import setup_commands
+from api.static_files import StaticManifest, send_static
+from api.db_pool import engine_options_from_env, pool_metrics
+from api.metrics import metrics, register_collector
+from api.db_routing import init_replicas, replica_binds_from_env
+from api.instrumentation import RequestInstrumentation
+from api.json_provider import FastJSONProvider
+from api.compression import init_compression, compression_metrics
+from api.rate_limit import init_rate_limit
+from api.revocation import init_revocation
+from api.events import init_events
+from api.mirror_cache import init_mirror_cache
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
-ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), "../dist/")
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
 
-# ---- Core config / secrets (IMPORTANT for JWT)
-app_key = os.getenv("FLASK_APP_KEY", "change-me")
-app.config["SECRET_KEY"] = app_key
-app.config["JWT_SECRET_KEY"] = app_key
-
-# CORS
-CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=False)
-
-# JWT (after keys)
-jwt = JWTManager(app)
-
-# Database configuration
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config["SQLALCHEMY_DATABASE_URI"] = db_url.replace(
-        "postgres://", "postgresql://")
-else:
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:////tmp/test.db"
-
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-MIGRATE = Migrate(app, db, compare_type=True)
-db.init_app(app)
-
-
-# Admin + commands
-setup_admin(app)
-setup_commands(app)
-
-
-# Register API blueprint
-app.register_blueprint(api, url_prefix="/api")
+def default_config():
+    """Config read from the environment. Anything passed to create_app wins."""
+    app_key = os.getenv("FLASK_APP_KEY", "change-me")
+
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        db_url = db_url.replace("postgres://", "postgresql://")
+    else:
+        db_url = "sqlite:////tmp/test.db"
+
+    replica_binds = replica_binds_from_env()
+
+    # Each open Mirror stream holds a gthread thread; with gevent it's a greenlet
+    gevent = os.getenv("WEB_WORKER_CLASS", "gthread") == "gevent"
+    stream_clients = 50 if gevent else max(1, int(os.getenv("WEB_THREADS", 4)) // 4)
+
+    return {
+        "ENV": "development" if os.getenv("FLASK_DEBUG") == "1" else "production",
+        # Core config / secrets (IMPORTANT for JWT)
+        "SECRET_KEY": app_key,
+        "JWT_SECRET_KEY": app_key,
+        "SQLALCHEMY_DATABASE_URI": db_url,
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        # Read replicas (DATABASE_REPLICA_URLS) for views marked @replica_reads
+        "SQLALCHEMY_BINDS": replica_binds,
+        "DB_REPLICA_BINDS": list(replica_binds),
+        "DB_REPLICA_STICKY_SECONDS": int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5)),
+        # Flask-Admin registers a view per model; workers that never serve
+        # /admin can skip it with ADMIN_ENABLED=0
+        "ADMIN_ENABLED": os.getenv("ADMIN_ENABLED", "1") == "1",
+        "STATIC_FOLDER": static_file_dir,
+        # dist/ files without a content hash (favicon, images) get this max-age;
+        # hashed assets are immutable and index.html is always revalidated
+        "STATIC_MAX_AGE": int(os.getenv("STATIC_MAX_AGE", 3600)),
+        # GET /metrics (Prometheus text), off unless METRICS_ENABLED=1
+        "METRICS_ENABLED": os.getenv("METRICS_ENABLED") == "1",
+        "METRICS_TOKEN": os.getenv("METRICS_TOKEN"),
+        # cProfile a fraction of requests; keep the ones slower than PROFILE_SLOW_MS
+        "PROFILE_SAMPLE_RATE": float(os.getenv("PROFILE_SAMPLE_RATE", 0)),
+        "PROFILE_SLOW_MS": int(os.getenv("PROFILE_SLOW_MS", 500)),
+        "PROFILE_KEEP": int(os.getenv("PROFILE_KEEP", 20)),
+        # gzip/brotli for /api/* JSON (api/compression.py)
+        "COMPRESS_ENABLED": os.getenv("COMPRESS_ENABLED", "1") == "1",
+        "COMPRESS_MIN_SIZE": int(os.getenv("COMPRESS_MIN_SIZE", 1024)),
+        "COMPRESS_GZIP_LEVEL": int(os.getenv("COMPRESS_GZIP_LEVEL", 6)),
+        "COMPRESS_BR_QUALITY": int(os.getenv("COMPRESS_BR_QUALITY", 4)),
+        "COMPRESS_CACHE_SIZE": int(os.getenv("COMPRESS_CACHE_SIZE", 64)),
+        # Token buckets per auth endpoint family (api/rate_limit.py)
+        "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "1") == "1",
+        "RATE_LIMIT_LOGIN_IP": os.getenv("RATE_LIMIT_LOGIN_IP", "20/60"),
+        "RATE_LIMIT_LOGIN_EMAIL": os.getenv("RATE_LIMIT_LOGIN_EMAIL", "5/300"),
+        "RATE_LIMIT_REGISTER_IP": os.getenv("RATE_LIMIT_REGISTER_IP", "10/3600"),
+        "RATE_LIMIT_REGISTER_EMAIL": os.getenv("RATE_LIMIT_REGISTER_EMAIL", "3/3600"),
+        "RATE_LIMIT_FORGOT_PASSWORD_IP": os.getenv("RATE_LIMIT_FORGOT_PASSWORD_IP", "10/600"),
+        "RATE_LIMIT_FORGOT_PASSWORD_EMAIL": os.getenv("RATE_LIMIT_FORGOT_PASSWORD_EMAIL", "3/900"),
+        "RATE_LIMIT_VERIFY_EMAIL_IP": os.getenv("RATE_LIMIT_VERIFY_EMAIL_IP", "20/60"),
+        "RATE_LIMIT_ACCOUNT_IP": os.getenv("RATE_LIMIT_ACCOUNT_IP", "5/300"),
+        # Only behind a proxy that sets X-Forwarded-For (render.yaml turns it on)
+        "RATE_LIMIT_TRUST_PROXY": os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1",
+        "RATE_LIMIT_STORAGE_URL": os.getenv("RATE_LIMIT_STORAGE_URL"),
+        # How long an Idempotency-Key answer is replayed (api/idempotency.py)
+        "IDEMPOTENCY_TTL_HOURS": int(os.getenv("IDEMPOTENCY_TTL_HOURS", 24)),
+        # A key claimed by a request that never answered (killed worker) is
+        # free again after this; keep it above gunicorn's WEB_TIMEOUT
+        "IDEMPOTENCY_LEASE_SECONDS": int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 2 * int(os.getenv("WEB_TIMEOUT", 30)))),
+        # Monthly partitions kept ready by `flask partitions-create` (api/partitions.py)
+        "PARTITION_MONTHS_AHEAD": int(os.getenv("PARTITION_MONTHS_AHEAD", 3)),
+        # `flask archive-history` (api/archive.py)
+        "ARCHIVE_HORIZON_DAYS": int(os.getenv("ARCHIVE_HORIZON_DAYS", 365)),
+        "ARCHIVE_INACTIVE_DAYS": int(os.getenv("ARCHIVE_INACTIVE_DAYS", 180)),
+        # `flask purge-users --retention` policies, 0 = off (api/purge.py)
+        "RETENTION_UNVERIFIED_DAYS": int(os.getenv("RETENTION_UNVERIFIED_DAYS", 0)),
+        "RETENTION_DORMANT_DAYS": int(os.getenv("RETENTION_DORMANT_DAYS", 0)),
+        # /admin/dashboard/ snapshots from `flask refresh-dashboard` (api/dashboard.py)
+        "DASHBOARD_DAYS": int(os.getenv("DASHBOARD_DAYS", 14)),
+        "DASHBOARD_STALE_SECONDS": int(os.getenv("DASHBOARD_STALE_SECONDS", 1800)),
+        "DASHBOARD_CACHE_SECONDS": int(os.getenv("DASHBOARD_CACHE_SECONDS", 60)),
+        # How often each worker reloads revoked users (api/revocation.py)
+        "JWT_REVOCATION_REFRESH_SECONDS": int(os.getenv("JWT_REVOCATION_REFRESH_SECONDS", 30)),
+        # Lifetime of GET /api/verify-email links (api/email_verification.py)
+        "VERIFY_EMAIL_TTL_HOURS": int(os.getenv("VERIFY_EMAIL_TTL_HOURS", 24)),
+        # GET /api/mirror/stream, live Mirror updates (api/events.py)
+        "MIRROR_STREAM_ENABLED": os.getenv("MIRROR_STREAM_ENABLED", "1" if gevent else "0") == "1",
+        "MIRROR_STREAM_MAX_CLIENTS": int(os.getenv("MIRROR_STREAM_MAX_CLIENTS", stream_clients)),
+        "MIRROR_STREAM_MAX_SECONDS": int(os.getenv("MIRROR_STREAM_MAX_SECONDS", 300)),
+        "MIRROR_STREAM_HEARTBEAT_SECONDS": int(os.getenv("MIRROR_STREAM_HEARTBEAT_SECONDS", 15)),
+        "MIRROR_EVENTS_STORAGE_URL": os.getenv("MIRROR_EVENTS_STORAGE_URL"),
+        # Cached /api/mirror/today and /week bodies (api/mirror_cache.py)
+        "MIRROR_CACHE_ENABLED": os.getenv("MIRROR_CACHE_ENABLED", "1") == "1",
+        "MIRROR_CACHE_SIZE": int(os.getenv("MIRROR_CACHE_SIZE", 5000)),
+        "MIRROR_CACHE_TTL_SECONDS": int(os.getenv("MIRROR_CACHE_TTL_SECONDS", 600)),
+        "MIRROR_CACHE_STORAGE_URL": os.getenv("MIRROR_CACHE_STORAGE_URL"),
+    }
+
+
+def create_app(config=None):
+    """
+    Application factory. `config` is an optional mapping applied on top of
+    default_config(), e.g. create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    # orjson when installed, stdlib json otherwise
+    app.json = FastJSONProvider(app)
+
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.from_mapping(config)
+    # Pool size/overflow/recycle/pre-ping/statement timeout (DB_* env vars),
+    # for the final database URI unless the caller passed its own options
+    if "SQLALCHEMY_ENGINE_OPTIONS" not in app.config:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(
+            app.config["SQLALCHEMY_DATABASE_URI"])
+
+    # CORS
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=False)
+
+    # JWT (after keys); revoked tokens are rejected (api/revocation.py)
+    jwt = JWTManager(app)
+    init_revocation(app, jwt)
+
+    # Database
+    Migrate(app, db, compare_type=True)
+    db.init_app(app)
+    init_replicas(app)
+
+    # Admin + commands (flask_admin is only imported when the admin is enabled)
+    if app.config["ADMIN_ENABLED"]:
+        from api.admin import setup_admin
+        setup_admin(app)
+    setup_commands(app)
+
+    # Register API blueprint
+    app.register_blueprint(api, url_prefix="/api")
+    init_compression(app)
+    init_rate_limit(app)
+    init_events(app)
+    init_mirror_cache(app)
+
+    if app.config["METRICS_ENABLED"]:
+        app.register_blueprint(metrics)
+        register_collector(app, lambda: pool_metrics(db.engines))
+        instrumentation = RequestInstrumentation()
+        instrumentation.init_app(app)
+        register_collector(app, instrumentation.families)
+        register_collector(app, app.extensions["rate_limiter"].families)
+        register_collector(app, app.extensions["jwt_revocations"].families)
+        register_collector(app, app.extensions["mirror_events"].families)
+        if "mirror_cache" in app.extensions:
+            register_collector(app, app.extensions["mirror_cache"].families)
+        if "compressed_cache" in app.extensions:
+            register_collector(
+                app, lambda: compression_metrics(app.extensions["compressed_cache"]))
+
+    # dist/ is scanned once here instead of stat-ing files on every request
+    app.extensions["static_manifest"] = StaticManifest(app.config["STATIC_FOLDER"])
+
+    app.register_error_handler(APIException, handle_invalid_usage)
+    app.add_url_rule("/", view_func=sitemap)
+    app.add_url_rule("/<path:path>", view_func=serve_any_other_file, methods=["GET"])
+
+    return app
 
 
 # Error handling
-@app.errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 
 # Sitemap
-@app.route("/")
 def sitemap():
-    if ENV == "development":
-        return generate_sitemap(app)
-    return send_from_directory(static_file_dir, "index.html")
+    if current_app.config["ENV"] == "development":
+        return generate_sitemap(current_app)
+    return send_static(current_app.extensions["static_manifest"], "index.html")
 
 
 # Serve SPA
-@app.route("/<path:path>", methods=["GET"])
 def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = "index.html"
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0
-    return response
+    manifest = current_app.extensions["static_manifest"]
+    # In development `npm run build` may add files after boot
+    if path not in manifest and current_app.config["ENV"] == "development":
+        manifest.scan()
+    return send_static(manifest, path)
 
 
 if __name__ == "__main__":
     PORT = int(os.environ.get("PORT", 3001))
-    app.run(host="0.0.0.0", port=PORT, debug=True)
+    create_app().run(host="0.0.0.0", port=PORT, debug=True)
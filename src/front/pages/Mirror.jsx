@@ -1,4 +1,4 @@
-import React, { useEffect, useMemo, useState } from "react";
+import React, { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import { Link } from "react-router-dom";
 
 const getBackendUrl = () => {
@@ -6,6 +6,11 @@ const getBackendUrl = () => {
   return (url || "").replace(/\/$/, "");
 };
 
+// Sin stream (apagado o servidor lleno): se recarga /api/mirror/today cada minuto
+const POLL_MS = 60000;
+// Conexiones seguidas que fallan sin llegar a abrirse antes de pasar a consultar
+const MAX_STREAM_FAILURES = 3;
+
 const formatDateTime = (isoString) => {
   if (!isoString) return "";
   const d = new Date(isoString);
@@ -78,43 +83,171 @@ export const Mirror = () => {
   const [rangeView, setRangeView] = useState("today"); // "today" | "7d" | "30d"
   const [activityView, setActivityView] = useState("chrono"); // "chrono" | "session"
 
+  const loadToday = useCallback(async () => {
+    if (!BACKEND_URL) {
+      setError("Falta configurar VITE_BACKEND_URL.");
+      setLoading(false);
+      return;
+    }
+    if (!token) {
+      setLoading(false);
+      return;
+    }
+
+    try {
+      setLoading(true);
+      setError("");
+
+      const res = await fetch(`${BACKEND_URL}/api/mirror/today`, {
+        method: "GET",
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      const payload = await res.json().catch(() => ({}));
+      if (!res.ok) {
+        const msg = payload?.msg || payload?.message || "No se pudo cargar el Espejo.";
+        throw new Error(msg);
+      }
+
+      setDataToday(payload);
+    } catch (e) {
+      setError(e?.message || "Error inesperado cargando el Espejo.");
+    } finally {
+      setLoading(false);
+    }
+  }, [BACKEND_URL, token]);
+
+  useEffect(() => {
+    loadToday();
+  }, [loadToday]);
+
+  // Fecha del payload cargado, para los eventos en vivo
+  const loadedDateRef = useRef(null);
   useEffect(() => {
-    const run = async () => {
-      if (!BACKEND_URL) {
-        setError("Falta configurar VITE_BACKEND_URL.");
-        setLoading(false);
+    loadedDateRef.current = dataToday?.date ?? null;
+  }, [dataToday]);
+
+  // Cambios en vivo (SSE, /api/mirror/stream): se aplican sobre dataToday
+  // sin volver a pedir /api/mirror/today. Cada conexión usa un token corto
+  // de /api/mirror/stream-token (va en la URL); al caerse se pide otro.
+  // Si el servidor no admite más streams se deja de reconectar y se consulta.
+  useEffect(() => {
+    if (!BACKEND_URL || !token || typeof EventSource === "undefined") return;
+
+    let source = null;
+    let retryTimer = null;
+    let pollTimer = null;
+    let cancelled = false;
+    let connectedBefore = false;
+    let failures = 0;
+
+    const update = (fn) => (e) => {
+      let data = {};
+      try {
+        data = JSON.parse(e.data);
+      } catch {
         return;
       }
-      if (!token) {
-        setLoading(false);
+      // Otro día (o aún sin cargar): mejor recargar entero
+      if (!loadedDateRef.current || (data.date && data.date !== loadedDateRef.current)) {
+        loadToday();
         return;
       }
+      setDataToday((prev) => fn(prev, data));
+    };
 
-      try {
-        setLoading(true);
-        setError("");
+    const poll = () => {
+      if (source) source.close();
+      source = null;
+      if (!cancelled) pollTimer = setInterval(loadToday, POLL_MS);
+    };
 
-        const res = await fetch(`${BACKEND_URL}/api/mirror/today`, {
-          method: "GET",
+    const reconnect = () => {
+      if (source) source.close();
+      source = null;
+      // EventSource no deja ver el 503: se cuentan los fallos sin abrir
+      failures += 1;
+      if (failures >= MAX_STREAM_FAILURES) {
+        poll();
+        return;
+      }
+      if (!cancelled) retryTimer = setTimeout(connect, 3000);
+    };
+
+    const connect = async () => {
+      let streamToken = null;
+      let unavailable = false;
+      try {
+        const res = await fetch(`${BACKEND_URL}/api/mirror/stream-token`, {
+          method: "POST",
           headers: { Authorization: `Bearer ${token}` },
         });
-
-        const payload = await res.json().catch(() => ({}));
-        if (!res.ok) {
-          const msg = payload?.msg || payload?.message || "No se pudo cargar el Espejo.";
-          throw new Error(msg);
-        }
-
-        setDataToday(payload);
-      } catch (e) {
-        setError(e?.message || "Error inesperado cargando el Espejo.");
-      } finally {
-        setLoading(false);
+        if (res.ok) streamToken = (await res.json())?.token;
+        // 404: stream apagado; 503: demasiadas conexiones
+        unavailable = res.status === 404 || res.status === 503;
+      } catch {
+        // sin red: se reintenta
+      }
+      if (cancelled) return;
+      if (unavailable) {
+        poll();
+        return;
+      }
+      if (!streamToken) {
+        reconnect();
+        return;
       }
+
+      source = new EventSource(
+        `${BACKEND_URL}/api/mirror/stream?jwt=${encodeURIComponent(streamToken)}`
+      );
+
+      source.addEventListener("completion", update((prev, { activity }) => {
+        const category = activity.category_name;
+        return {
+          ...prev,
+          activities: [...(prev.activities || []), activity],
+          points_by_category: {
+            ...(prev.points_by_category || {}),
+            [category]: (prev.points_by_category?.[category] || 0) + activity.points,
+          },
+        };
+      }));
+
+      source.addEventListener("points", update((prev, { session }) => {
+        const others = (prev.sessions || []).filter((s) => s.id !== session.id);
+        const sessions = [...others, session];
+        return {
+          ...prev,
+          sessions,
+          points_today: sessions.reduce((acc, s) => acc + (s.points_earned || 0), 0),
+        };
+      }));
+
+      source.addEventListener("checkin", update((prev, { emotion }) => ({ ...prev, emotion })));
+
+      source.addEventListener("reset", () => loadToday());
+      source.addEventListener("resync", () => loadToday());
+
+      // Al reconectar pueden haberse perdido eventos
+      source.onopen = () => {
+        if (connectedBefore) loadToday();
+        connectedBefore = true;
+        failures = 0;
+      };
+      // El token ya no vale para reconectar: se pide uno nuevo
+      source.onerror = reconnect;
     };
 
-    run();
-  }, [BACKEND_URL, token]);
+    connect();
+
+    return () => {
+      cancelled = true;
+      clearTimeout(retryTimer);
+      clearInterval(pollTimer);
+      if (source) source.close();
+    };
+  }, [BACKEND_URL, token, loadToday]);
 
   const sessions = dataToday?.sessions || [];
   const activities = dataToday?.activities || [];
@@ -12,7 +12,7 @@ import { activitiesCatalog } from "../data/activities";
 import { getUserScope } from "../services/authService";
 
 // puntos (local)
-import { loadPointsState, awardPointsOnce, normalizePointsResult } from "../services/pointsService";
+import { loadPointsState, awardPointsOnce, normalizePointsResult, syncPointsState } from "../services/pointsService";
 
 /*-------------
  *
@@ -167,8 +167,12 @@ export const Today = () => {
         setCompleted(saved.completed);
         setActiveActivity(null);
 
-        // refresco puntos (si pointsService ya está namespaced, perfecto; si no, lo haremos luego)
+        // refresco puntos: local al instante, luego el ledger del backend
         setPointsToday(loadPointsState(dateKey).total);
+        syncPointsState(dateKey).then((st) => {
+            // Cerca de medianoche el día UTC del backend no es el local
+            if (st.date === dateKey) setPointsToday(st.total);
+        });
     }, [userScope, phase, dateKey]);
 
     // 4) Persistencia completadas
@@ -393,6 +397,10 @@ export const Today = () => {
         // puntos: si backend devuelve puntos, úsalo; si no, calcula local según source
         if (backendResult && backendResult.points_awarded != null) {
             awardPointsFor(activity, { source, overridePoints: backendResult.points_awarded });
+            // el backend manda: trae solo los cambios desde la última versión
+            syncPointsState(dateKey).then((st) => {
+                if (st.date === dateKey) setPointsToday(st.total);
+            });
         } else {
             awardPointsFor(activity, { source });
         }
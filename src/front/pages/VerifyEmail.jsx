@@ -0,0 +1,47 @@
+import React from "react";
+import { Link, useSearchParams } from "react-router-dom";
+
+// Destino del enlace de verificación (GET /api/verify-email redirige aquí)
+const MESSAGES = {
+    ok: {
+        title: "Email verificado.",
+        text: "Tu cuenta ya está verificada. Ya puedes entrar.",
+        alert: "alert-success",
+    },
+    verified: {
+        title: "Ya estaba verificado.",
+        text: "Este enlace ya se usó: tu email está verificado.",
+        alert: "alert-info",
+    },
+    expired: {
+        title: "Enlace caducado.",
+        text: "El enlace ha caducado y ya no sirve para verificar tu email.",
+        alert: "alert-warning",
+    },
+    invalid: {
+        title: "Enlace inválido.",
+        text: "No hemos podido verificar tu email con este enlace.",
+        alert: "alert-warning",
+    },
+};
+
+export const VerifyEmail = () => {
+    const [params] = useSearchParams();
+    const message = MESSAGES[params.get("status")] || MESSAGES.invalid;
+
+    return (
+        <div className="container py-4 py-lg-5">
+            <div className="row justify-content-center">
+                <div className="col-12 col-lg-7 bg-white pb-auth-card shadow-sm">
+                    <div className="p-4 p-md-5">
+                        <h2 className="h3 fw-bold mb-3">{message.title}</h2>
+                        <div className={`alert ${message.alert} pb-fade-in`}>{message.text}</div>
+                        <Link className="btn btn-primary" to="/auth/login">
+                            Ir a login
+                        </Link>
+                    </div>
+                </div>
+            </div>
+        </div>
+    );
+};
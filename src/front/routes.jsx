@@ -9,6 +9,7 @@ import { Login } from "./pages/Login";
 import { Signup } from "./pages/Signup";
 import { ForgotPassword } from "./pages/ForgotPassword";
 import { ResetPassword } from "./pages/ResetPassword";
+import { VerifyEmail } from "./pages/VerifyEmail";
 
 import { Today } from "./pages/Today";
 import { Activities } from "./pages/Activities";
@@ -25,6 +26,7 @@ export const router = createBrowserRouter([
       { path: "/auth/signup", element: <Signup /> },
       { path: "/auth/forgot", element: <ForgotPassword /> },
       { path: "/auth/reset", element: <ResetPassword /> },
+      { path: "/auth/verify", element: <VerifyEmail /> },
     ],
   },
 
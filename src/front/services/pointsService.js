@@ -1,6 +1,7 @@
 import { getUserScope } from "./authService";
 // src/front/services/pointsService.js
-// MVP localStorage. Preparado para reemplazar por API sin tocar la UI.
+// Caché en localStorage del ledger del backend (syncPointsState, GET /api/points/today).
+// awardPointsOnce calcula en local cuando no hay backend (sin token, sin conexión).
 
 const getDateKey = () => {
   const d = new Date();
@@ -16,7 +17,9 @@ const storageKey = (dateKey) => `pb_${getUserScope()}_points_${dateKey}`;
  * Estado:
  * {
  *   total: number,
- *   ledger: { [activityId]: number }  // puntos otorgados por actividad ese día
+ *   ledger: { [activityId]: number },  // puntos otorgados por actividad ese día
+ *   version?: string,                  // versión del backend sincronizada
+ *   synced?: { [activityId]: number }  // ledger del backend en esa versión
  * }
  */
 export function loadPointsState(dateKey = getDateKey()) {
@@ -24,13 +27,18 @@ export function loadPointsState(dateKey = getDateKey()) {
     const raw = localStorage.getItem(storageKey(dateKey));
     if (!raw) return { total: 0, ledger: {} };
     const parsed = JSON.parse(raw);
-    return {
+    const state = {
       total: Number.isFinite(parsed?.total) ? parsed.total : 0,
       ledger:
         parsed?.ledger && typeof parsed.ledger === "object"
           ? parsed.ledger
           : {},
     };
+    if (typeof parsed?.version === "string" && parsed?.synced && typeof parsed.synced === "object") {
+      state.version = parsed.version;
+      state.synced = parsed.synced;
+    }
+    return state;
   } catch {
     return { total: 0, ledger: {} };
   }
@@ -40,6 +48,51 @@ export function savePointsState(dateKey, state) {
   localStorage.setItem(storageKey(dateKey), JSON.stringify(state));
 }
 
+const API_BASE = (import.meta.env.VITE_BACKEND_URL || "").replace(/\/$/, "");
+
+/**
+ * Sincroniza con el ledger del backend (GET /api/points/today).
+ * Guarda la `version` del servidor y en las siguientes llamadas pide solo
+ * los cambios desde ella; el backend manda el ledger completo si hace falta.
+ * Devuelve el estado con `date`: el día (UTC) del backend, que cerca de
+ * medianoche puede no ser el local. Sin token/backend o si falla, devuelve
+ * el estado local.
+ */
+export async function syncPointsState(dateKey = getDateKey()) {
+  const local = loadPointsState(dateKey);
+  const localResult = { ...local, date: dateKey };
+  const token = localStorage.getItem("pb_token");
+  if (!token || !API_BASE) return localResult;
+
+  try {
+    const qs = local.version ? `?since=${encodeURIComponent(local.version)}` : "";
+    const res = await fetch(`${API_BASE}/api/points/today${qs}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    if (!res.ok) return localResult;
+    const data = await res.json();
+
+    let ledger;
+    if (data.full) {
+      ledger = data.ledger || {};
+    } else {
+      // Los cambios van sobre el ledger de esa versión, no sobre los puntos
+      // calculados en local desde entonces
+      ledger = { ...(local.synced || {}) };
+      for (const [activityId, points] of Object.entries(data.changes || {})) {
+        ledger[activityId] = (ledger[activityId] || 0) + points;
+      }
+    }
+
+    // El backend usa la fecha UTC: solo se guarda si coincide con la local
+    const next = { total: data.total, ledger, version: data.version, synced: ledger };
+    if (data.date === dateKey) savePointsState(dateKey, next);
+    return { ...next, date: data.date };
+  } catch {
+    return localResult;
+  }
+}
+
 export function hasAwarded(dateKey, activityId) {
   const st = loadPointsState(dateKey);
   return Object.prototype.hasOwnProperty.call(st.ledger, activityId);
@@ -98,7 +151,9 @@ export function awardPointsOnce({
     points = overridePoints;
   }
 
+  // Conserva version/synced: la próxima sincronización pide solo los cambios
   const next = {
+    ...st,
     total: st.total + points,
     ledger: { ...st.ledger, [activityId]: points },
   };
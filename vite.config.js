@@ -9,6 +9,8 @@ export default defineConfig({
         port: 3000
     },
     build: {
-        outDir: 'dist'
+        outDir: 'dist',
+        // dist/.vite/manifest.json: which files are hashed (src/api/static_files.py)
+        manifest: true
     }
 })
\ No newline at end of file